@@ -1,6 +1,11 @@
 import numpy as np
-import pyloudnorm as pyln
-from scipy.io.wavfile import write
+import fftbackend
+import channels
+import trajectory
+import lazy
+
+pyln = lazy.load("pyloudnorm")
+wavfile = lazy.load("scipy.io.wavfile")
 
 
 def Generate(**kwargs):
@@ -31,6 +36,9 @@ def Generate(**kwargs):
         Output file name.(optional)
     wav : bool
         Output wav file or not. If True, output wavfile.(optional)
+    parallel : bool
+        Synthesize and normalize the two channels concurrently in
+        threads. The output is the same.(optional)
 
     Returns
     -------
@@ -50,7 +58,7 @@ def Generate(**kwargs):
         lufs_targ = kwargs["LUFS"]
     else:
         lufs_targ = -17
-    meter = pyln.Meter(kwargs["srate"])
+    parallel = "parallel" in kwargs and kwargs["parallel"]
 
     # 周波数をbin数に直す
     total_bin = kwargs["srate"] * kwargs["duration"]
@@ -73,8 +81,8 @@ def Generate(**kwargs):
     top_zero = np.zeros(nq_bin - bwdhigh_bin, dtype=complex)
     fsig_left = np.hstack([dc, btm_zero, fsig_inbwd, top_zero])
     # 複素共役
-    fsig_right = np.conj(np.flipud(fsig_left[1:nq_bin]))
-    fsig = np.hstack([fsig_left, fsig_right])
+    spec = np.empty((2, 2 * nq_bin), dtype=complex)
+    channels.hermitian(spec[0], fsig_left, nq_bin)
 
     # shfit
     shft_bwdlow_bin = bwdlow_bin + int(ud * shift_bin)
@@ -84,31 +92,22 @@ def Generate(**kwargs):
     btm_zero = np.zeros(shft_bwdlow_bin, dtype=complex)
     top_zero = np.zeros(int(total_bin/2) - shft_bwdhigh_bin, dtype=complex)
     fshift_left = np.hstack([dc, btm_zero, fsig_inbwd, top_zero])
-    fshift_right = np.conj(np.flipud(fshift_left[1:nq_bin]))
     # 複素共役
-    fshift = np.hstack([fshift_left, fshift_right])
-
-    # IFFT
-    tsig = np.real(np.fft.ifft(fsig))*100
-    tshift = np.real(np.fft.ifft(fshift))*100
+    channels.hermitian(spec[1], fshift_left, nq_bin)
 
-    # cast
-    tsig = tsig.astype(np.float32)
-    tshift = tshift.astype(np.float32)
+    # IFFT, cast
+    tsig, tshift = channels.synthesize(spec, parallel)
 
     # normalize
-    lufs_sorc_l = meter.integrated_loudness(tsig)
-    lufs_sorc_r = meter.integrated_loudness(tshift)
-
-    tsig_n = pyln.normalize.loudness(tsig, lufs_sorc_l, lufs_targ)
-    tshift_n = pyln.normalize.loudness(tshift, lufs_sorc_r, lufs_targ)
+    tsig_n, tshift_n = channels.normalize([tsig, tshift], kwargs["srate"],
+                                          lufs_targ, parallel)
 
     sig = np.vstack([tsig_n, tshift_n])
 
     sig = np.vstack([tsig_n, tshift_n])
 
     if "wav" in kwargs:
-        write(file_name, kwargs["srate"], sig.T)
+        wavfile.write(file_name, kwargs["srate"], sig.T)
     else:
         return sig.T
 
@@ -143,6 +142,12 @@ def GenerateInitIpd(**kwargs):
         Output file name.(optional)
     wav : bool
         Output wav file or not. If True, output wavfile.(optional)
+    method : str
+        "analytic" or "crop". (default is analytic)
+        analytic: rotate the phase of both spectra by the onset time of
+        init_ipd, same cost as Generate() and exact for any init_ipd.
+        crop: synthesize twice the duration and cut out the window
+        starting at the onset sample.(optional)
 
     Returns
     -------
@@ -165,6 +170,32 @@ def GenerateInitIpd(**kwargs):
         lufs_targ = -17
     meter = pyln.Meter(kwargs["srate"])
 
+    if "method" in kwargs:
+        method = kwargs["method"]
+    else:
+        method = "analytic"
+
+    if method == "analytic":
+        tsig, tshift = _InitIpdAnalytic(kwargs["srate"], kwargs["shift"],
+                                        kwargs["duration"], kwargs["bwd"],
+                                        kwargs["centre"], ud,
+                                        kwargs["init_ipd"])
+
+        # normalize
+        lufs_sorc_l = meter.integrated_loudness(tsig)
+        lufs_sorc_r = meter.integrated_loudness(tshift)
+
+        tsig_n = pyln.normalize.loudness(tsig, lufs_sorc_l, lufs_targ)
+        tshift_n = pyln.normalize.loudness(tshift, lufs_sorc_r, lufs_targ)
+
+        sig = np.vstack([tsig_n, tshift_n])
+
+        if "wav" in kwargs:
+            wavfile.write(file_name, kwargs["srate"], sig.T)
+            return
+        else:
+            return sig.T
+
     # 周波数をbin数に直す
     false_dur = kwargs["duration"] * 2
     total_bin = kwargs["srate"] * false_dur
@@ -189,8 +220,8 @@ def GenerateInitIpd(**kwargs):
     fsig_left = np.hstack([dc, btm_zero, fsig_inbwd, top_zero])
 
     # 複素共役
-    fsig_right = np.conj(np.flipud(fsig_left[1:nq_bin]))
-    fsig = np.hstack([fsig_left, fsig_right])
+    spec = np.empty((2, 2 * nq_bin), dtype=complex)
+    channels.hermitian(spec[0], fsig_left, nq_bin)
 
     ## shfitの生成 ##
     shft_bwdlow_bin = bwdlow_bin + int(ud * shift_bin)
@@ -201,12 +232,10 @@ def GenerateInitIpd(**kwargs):
     top_zero = np.zeros(nq_bin - shft_bwdhigh_bin, dtype=complex)
 
     fshift_left = np.hstack([dc, btm_zero, fsig_inbwd, top_zero])
-    fshift_right = np.conj(np.flipud(fshift_left[1:nq_bin]))
-    fshift = np.hstack([fshift_left, fshift_right])
+    channels.hermitian(spec[1], fshift_left, nq_bin)
 
     # IFFT
-    tsig = np.real(np.fft.ifft(fsig))*100
-    tshift = np.real(np.fft.ifft(fshift))*100
+    tsig, tshift = np.real(fftbackend.ifft(spec, overwrite=True))*100
 
     # cast
     tsig = tsig.astype(np.float32)
@@ -229,6 +258,156 @@ def GenerateInitIpd(**kwargs):
     sig = np.vstack([tsig_n, tshift_n])
 
     if "wav" in kwargs:
-        write(file_name, kwargs["srate"], sig.T)
+        wavfile.write(file_name, kwargs["srate"], sig.T)
+    else:
+        return sig.T
+
+
+def GenerateSweep(**kwargs):
+    """
+    Generate a Akeroyd signal with a time-varying shift frequency.
+    The right channel is the analytic signal of the left channel rotated by
+    the integrated shift frequency, so the IPD is phase-continuous and a
+    constant shift gives the same signal as Generate().
+    Requires:
+        pyloudnorm
+        numpy
+        scipy
+
+    Parameters
+    ----------
+    srate : int
+        Sampling rate.
+    shift : float, ndarray() or list
+        Shift frequency in Hz. A constant, an array spread evenly over the
+        duration, or breakpoints [(time in seconds, Hz), ...] interpolated
+        linearly.
+    duration : int
+        Total duration in seconds.
+    bwd : int
+        Bandwidth in Hz.
+    centre : int
+        Centre frequency of bandpass filter in Hz.
+    init_direction : str
+        Initial direction of shift. Either "left" or "right".
+    init_ipd : float
+        Initial IPD in degree.(optional)
+    LUFS : int
+        Loundess value of output signal in LUFS.(optional)
+    file_name : str
+        Output file name.(optional)
+    wav : bool
+        Output wav file or not. If True, output wavfile.(optional)
+
+    Returns
+    -------
+    Output signal in 32-bit float wav format at current directory.
+    """
+    if kwargs["init_direction"] == "left":
+        ud = -1
+    elif kwargs["init_direction"] == "right":
+        ud = 1
+
+    if "file_name" in kwargs:
+        file_name = kwargs["file_name"]
+    else:
+        file_name = "akeroyd_sweep.wav"
+
+    if 'LUFS' in kwargs:
+        lufs_targ = kwargs["LUFS"]
+    else:
+        lufs_targ = -17
+
+    if "init_ipd" in kwargs:
+        init_phase = np.deg2rad(kwargs["init_ipd"])
+    else:
+        init_phase = 0
+    meter = pyln.Meter(kwargs["srate"])
+
+    # 周波数をbin数に直す
+    total_bin = kwargs["srate"] * kwargs["duration"]
+    nq_bin = int(total_bin / 2)
+    bwd_bin = kwargs["bwd"] * kwargs["duration"]
+    bwdlow_bin = (kwargs["centre"] - int(kwargs["bwd"]/2)) * kwargs["duration"]
+
+    # 通過帯域内の信号生成
+    fsig_inbwd = np.random.normal(size=bwd_bin) + 1j * \
+        np.random.normal(size=bwd_bin)
+
+    # 解析信号のスペクトル (正の周波数のみ, 2倍)
+    spec = np.zeros(2 * nq_bin, dtype=complex)
+    spec[1 + bwdlow_bin:1 + bwdlow_bin + bwd_bin] = 2 * fsig_inbwd
+
+    # IFFT
+    analytic = fftbackend.ifft(spec) * 100
+
+    # shift周波数の軌跡を位相に積分して回転
+    shift = trajectory.resolve(kwargs["shift"], kwargs["srate"], 2 * nq_bin)
+    phase = trajectory.cumulative_phase(ud * shift, kwargs["srate"],
+                                        ud * init_phase)
+
+    tsig = np.real(analytic)
+    tshift = np.real(analytic * np.exp(1j * phase))
+
+    # cast
+    tsig = tsig.astype(np.float32)
+    tshift = tshift.astype(np.float32)
+
+    # normalize
+    lufs_sorc_l = meter.integrated_loudness(tsig)
+    lufs_sorc_r = meter.integrated_loudness(tshift)
+
+    tsig_n = pyln.normalize.loudness(tsig, lufs_sorc_l, lufs_targ)
+    tshift_n = pyln.normalize.loudness(tshift, lufs_sorc_r, lufs_targ)
+
+    sig = np.vstack([tsig_n, tshift_n])
+
+    if "wav" in kwargs:
+        wavfile.write(file_name, kwargs["srate"], sig.T)
     else:
         return sig.T
+
+
+def _InitIpdAnalytic(srate, shift, duration, bwd, centre, ud, init_ipd):
+    """
+    Synthesize both channels of GenerateInitIpd() with one real IFFT.
+
+    The onset of init_ipd (init_ipd / 360 periods of the shift frequency)
+    is applied as a linear phase on the spectra, i.e. an exact circular
+    time shift of the periodic signal, instead of cutting it out of a
+    signal with twice the duration.
+
+    Returns
+    -------
+    Left and right channel as 32-bit float ndarray().
+    """
+    # 周波数をbin数に直す
+    total_bin = srate * duration
+    nq_bin = int(total_bin / 2)
+    shift_bin = shift * duration
+    bwd_bin = bwd * duration
+
+    # 通過帯域の上限下限のbin番号
+    bwdlow_bin = (centre - int(bwd/2)) * duration
+    shft_bwdlow_bin = bwdlow_bin + int(ud * shift_bin)
+
+    # 通過帯域内の信号生成
+    fsig_inbwd = np.random.normal(size=bwd_bin) + 1j * \
+        np.random.normal(size=bwd_bin)
+
+    # 片側スペクトル (DC ~ Nyquist)
+    spec = np.zeros((2, nq_bin + 1), dtype=complex)
+    spec[0, 1 + bwdlow_bin:1 + bwdlow_bin + bwd_bin] = fsig_inbwd
+    spec[1, 1 + shft_bwdlow_bin:1 + shft_bwdlow_bin + bwd_bin] = fsig_inbwd
+
+    # 初期IPDの分だけ時間をずらす (bin k の周波数は k / duration Hz)
+    onset = (init_ipd / 360) * (1 / shift)
+    spec *= np.exp(1j * 2 * np.pi * np.arange(nq_bin + 1) / duration * onset)
+
+    # IFFT
+    tsig = fftbackend.irfft(spec, n=2 * nq_bin, axis=-1) * 100
+
+    # cast
+    tsig = tsig.astype(np.float32)
+
+    return tsig[0], tsig[1]
@@ -0,0 +1,291 @@
+import numpy as np
+import fftbackend
+import lazy
+
+pyln = lazy.load("pyloudnorm")
+wavfile = lazy.load("scipy.io.wavfile")
+
+
+def _batch(signals):
+    # (n,2) 1つでも (B,n,2) でも (B,n,2) にそろえる
+    signals = np.asarray(signals)
+    if signals.ndim == 2:
+        signals = signals[np.newaxis]
+    return signals
+
+
+def stft(signals, n_fft=4096, hop=1024):
+    """
+    Batched short-time Fourier transform with a Hann window.
+    Requires:
+        numpy
+
+    Parameters
+    ----------
+    signals : ndarray()
+        shape: (..., n). The last axis is time.
+    n_fft : int
+        Frame length in samples.
+    hop : int
+        Hop size in samples.
+
+    Returns
+    -------
+    Spectra in ndarray(), shape: (..., frames, n_fft // 2 + 1)
+    """
+    frames = np.lib.stride_tricks.sliding_window_view(
+        signals, n_fft, axis=-1)[..., ::hop, :]
+    return fftbackend.rfft(frames * np.hanning(n_fft), axis=-1)
+
+
+def _band(srate, n_fft, centre, bwd):
+    freqs = np.fft.rfftfreq(n_fft, 1 / srate)
+    return (freqs >= centre - bwd / 2) & (freqs <= centre + bwd / 2)
+
+
+def band_energy_ratio(signals, srate, centre, bwd):
+    """
+    Fraction of the energy inside the pass band, per stimulus and channel.
+
+    Parameters
+    ----------
+    signals : ndarray()
+        shape: (n,2) or (B,n,2)
+    srate : int
+        Sampling rate in Hz.
+    centre : float
+        Centre frequency in Hz.
+    bwd : float
+        Bandwidth in Hz.
+
+    Returns
+    -------
+    ndarray(), shape: (B,2)
+    """
+    signals = _batch(signals)
+    power = np.abs(fftbackend.rfft(signals, axis=1)) ** 2
+    band = _band(srate, signals.shape[1], centre, bwd)
+    total = power.sum(axis=1)
+    return power[:, band].sum(axis=1) / np.where(total > 0, total, 1)
+
+
+def interaural(signals, srate, centre, bwd, n_fft=4096, hop=1024):
+    """
+    Interaural phase and level difference over time in the pass band.
+
+    Parameters
+    ----------
+    signals : ndarray()
+        shape: (n,2) or (B,n,2)
+    srate : int
+        Sampling rate in Hz.
+    centre : float
+        Centre frequency in Hz.
+    bwd : float
+        Bandwidth in Hz.
+    n_fft : int
+        Frame length in samples.(optional)
+    hop : int
+        Hop size in samples.(optional)
+
+    Returns
+    -------
+    times (frames,) in seconds, IPD (B, frames) in radians (right relative
+    to left) and ILD (B, frames) in dB (left over right).
+    """
+    signals = _batch(signals)
+    spec = stft(np.moveaxis(signals, 1, -1), n_fft, hop)
+    band = _band(srate, n_fft, centre, bwd)
+    spec_l = spec[:, 0][..., band]
+    spec_r = spec[:, 1][..., band]
+
+    cross = np.sum(spec_r * np.conj(spec_l), axis=-1)
+    power_l = np.sum(np.abs(spec_l) ** 2, axis=-1)
+    power_r = np.sum(np.abs(spec_r) ** 2, axis=-1)
+
+    tiny = np.finfo(float).tiny
+    ipd = np.angle(cross)
+    ild = 10 * np.log10((power_l + tiny) / (power_r + tiny))
+    times = (np.arange(spec.shape[2]) * hop + n_fft / 2) / srate
+    return times, ipd, ild
+
+
+def beat_rate(times, ipd):
+    """
+    Rate of IPD rotation in Hz from a least-squares fit of the unwrapped
+    IPD. Positive when the right channel leads increasingly.
+
+    Parameters
+    ----------
+    times : ndarray()
+        Frame times in seconds.
+    ipd : ndarray()
+        shape: (B, frames) in radians.
+
+    Returns
+    -------
+    ndarray(), shape: (B,)
+    """
+    phase = np.unwrap(ipd, axis=-1)
+    t = times - times.mean()
+    slope = (phase - phase.mean(axis=-1, keepdims=True)) @ t / (t @ t)
+    return slope / (2 * np.pi)
+
+
+def itd(signals, srate, max_lag=0.002):
+    """
+    Interaural time difference from the peak of the cross-correlation
+    (computed with batched FFTs).
+
+    Parameters
+    ----------
+    signals : ndarray()
+        shape: (n,2) or (B,n,2)
+    srate : int
+        Sampling rate in Hz.
+    max_lag : float
+        Largest lag searched in seconds.(optional)
+
+    Returns
+    -------
+    ndarray(), shape: (B,), seconds. Positive when the right channel lags.
+    """
+    signals = _batch(signals)
+    n = signals.shape[1]
+    n_fft = fftbackend.next_fast_len(2 * n)
+    spec = fftbackend.rfft(signals, n=n_fft, axis=1)
+    xcorr = fftbackend.irfft(spec[:, :, 1] * np.conj(spec[:, :, 0]),
+                             n=n_fft, axis=1)
+    max_bin = int(max_lag * srate)
+    lags = np.arange(-max_bin, max_bin + 1)
+    lag = lags[np.argmax(xcorr[:, lags], axis=1)]
+    return lag / srate
+
+
+def lufs(signals, srate):
+    """
+    Integrated loudness per stimulus and channel.
+
+    Returns
+    -------
+    ndarray(), shape: (B,2), LUFS.
+    """
+    signals = _batch(signals)
+    meter = pyln.Meter(srate)
+    return np.array([[meter.integrated_loudness(s[:, ch])
+                      for ch in range(s.shape[1])] for s in signals])
+
+
+def verify(signals, srate, spec, tol=None, n_fft=4096, hop=1024):
+    """
+    Check a batch of stimuli against the parameters that created them.
+
+    Parameters
+    ----------
+    signals : ndarray()
+        shape: (n,2) or (B,n,2)
+    srate : int
+        Sampling rate in Hz.
+    spec : dict
+        Expected values. Any of
+        centre, bwd : pass band in Hz (band energy ratio, widened by the
+            shift on both sides, and IPD/ILD band)
+        shift : beat rate in Hz (absolute value of the IPD rotation)
+        delay : ITD in milliseconds (absolute value)
+        LUFS : loudness of each channel
+    tol : dict
+        Tolerances. Defaults: band_ratio 0.99 (minimum), shift 0.1 Hz,
+        delay 0.05 ms, LUFS 0.5 LU.(optional)
+    n_fft : int
+        STFT frame length.(optional)
+    hop : int
+        STFT hop size.(optional)
+
+    Returns
+    -------
+    List of dicts, one per stimulus, with the measured values, "failed"
+    (names of the checks that deviate) and "ok".
+    """
+    limits = {"band_ratio": 0.99, "shift": 0.1, "delay": 0.05, "LUFS": 0.5}
+    limits.update(tol or {})
+    signals = _batch(signals)
+    results = [{"failed": []} for _ in signals]
+
+    if "centre" in spec and "bwd" in spec:
+        # shift後の帯域も含める
+        width = spec["bwd"] + 2 * abs(spec.get("shift", 0))
+        ratio = band_energy_ratio(signals, srate, spec["centre"], width)
+        for r, value in zip(results, ratio):
+            r["band_ratio"] = value.min()
+            if value.min() < limits["band_ratio"]:
+                r["failed"].append("band_ratio")
+
+        if "shift" in spec:
+            times, ipd, ild = interaural(signals, srate, spec["centre"],
+                                         spec["bwd"], n_fft, hop)
+            rate = beat_rate(times, ipd)
+            for r, value, level in zip(results, rate, ild):
+                r["beat_rate"] = value
+                r["ild_range"] = np.ptp(level)
+                if abs(abs(value) - spec["shift"]) > limits["shift"]:
+                    r["failed"].append("shift")
+
+    if "delay" in spec:
+        delay = itd(signals, srate, max(2 * abs(spec["delay"]) / 1000, 0.002))
+        for r, value in zip(results, delay):
+            r["itd_ms"] = value * 1000
+            if abs(abs(value * 1000) - abs(spec["delay"])) > limits["delay"]:
+                r["failed"].append("delay")
+
+    if "LUFS" in spec:
+        loudness = lufs(signals, srate)
+        for r, value in zip(results, loudness):
+            r["LUFS"] = value
+            if np.max(np.abs(value - spec["LUFS"])) > limits["LUFS"]:
+                r["failed"].append("LUFS")
+
+    for r in results:
+        r["ok"] = not r["failed"]
+    return results
+
+
+def verify_files(files, spec, tol=None, batch_size=16, **kwargs):
+    """
+    verify() for wav files. Files of equal length and rate are analysed
+    together, batch_size files at a time, so memory is bounded by one
+    batch (the STFT of a batch is about 4 times its signal size).
+
+    Parameters
+    ----------
+    files : list of str
+        Wav file paths.
+    spec : dict or list of dict
+        Expected values, one for all files or one per file.
+    batch_size : int
+        Files per verify() call.(optional)
+
+    Returns
+    -------
+    dict of {file name: result of verify()}
+    """
+    specs = spec if isinstance(spec, (list, tuple)) else [spec] * len(files)
+    groups = {}
+    for file_name, s in zip(files, specs):
+        srate, data = wavfile.read(file_name, mmap=True)
+        key = (srate, data.shape, repr(sorted(s.items())))
+        groups.setdefault(key, []).append((file_name, s))
+        del data
+
+    results = {}
+    for (srate, _, _), items in groups.items():
+        for start in range(0, len(items), batch_size):
+            # 必要な分だけ読み込む
+            names = [file_name for file_name, _
+                     in items[start:start + batch_size]]
+            batch = np.stack([np.asarray(wavfile.read(f, mmap=True)[1],
+                                         dtype=np.float32) for f in names])
+            for file_name, r in zip(names, verify(batch, srate, items[0][1],
+                                                  tol, **kwargs)):
+                results[file_name] = r
+            del batch
+    return results
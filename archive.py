@@ -0,0 +1,243 @@
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+import lazy
+
+wavfile = lazy.load("scipy.io.wavfile")
+
+
+_MAGIC = b"STIMARC1"
+_FOOTER = struct.Struct("<Q8s")
+
+
+def _shuffle(data):
+    # float32のバイトを並べ替えて圧縮しやすくする
+    return np.ascontiguousarray(data.view(np.uint8).reshape(-1, 4).T).tobytes()
+
+
+def _unshuffle(raw):
+    return np.frombuffer(raw, dtype=np.uint8).reshape(4, -1).T.copy() \
+        .view(np.float32).ravel()
+
+
+def _last_index(f, size, block=2**20):
+    # 最後の有効なfooterを探す (追記中に落ちると後ろにchunkが残る)
+    end = size
+    while end > _FOOTER.size:
+        lo = max(0, end - block)
+        f.seek(lo)
+        data = f.read(end - lo)
+        i = data.rfind(_MAGIC)
+        while i >= 0:
+            stop = lo + i + len(_MAGIC)
+            if stop >= len(_MAGIC) + _FOOTER.size:
+                f.seek(stop - _FOOTER.size)
+                offset, _ = _FOOTER.unpack(f.read(_FOOTER.size))
+                if len(_MAGIC) <= offset <= stop - _FOOTER.size:
+                    f.seek(offset)
+                    try:
+                        index = json.loads(
+                            f.read(stop - _FOOTER.size - offset))
+                    except ValueError:
+                        index = None
+                    if isinstance(index, dict):
+                        return index, stop
+            i = data.rfind(_MAGIC, 0, i)
+        if lo == 0:
+            break
+        end = lo + len(_MAGIC) - 1
+    return None, None
+
+
+class Archive:
+    """
+    Many stimuli in one file, stored as independently compressed chunks.
+
+    Layout: magic, chunk data, JSON index, footer (index offset, magic).
+    Appending writes new chunks after the old footer and a new index and
+    footer in close(), so the previous index stays valid until then; an
+    archive whose append was interrupted opens with its last complete
+    index.
+    The index holds per stimulus its sampling rate, shape, parameters and
+    the offset of every chunk, so any stimulus and time range is read by
+    seeking to the covering chunks only.
+
+    Parameters
+    ----------
+    path : str
+        Archive file path.
+    mode : str
+        "r" read, "w" create/overwrite, "a" append. (default is r)
+    """
+
+    def __init__(self, path, mode="r"):
+        if mode not in ("r", "w", "a"):
+            raise ValueError("mode must be 'r', 'w' or 'a'")
+        self.path = path
+        self.mode = mode
+        self._index = {}
+        self._added = False
+
+        if mode == "w" or (mode == "a" and not os.path.exists(path)):
+            self._file = open(path, "w+b")
+            self._file.write(_MAGIC)
+            self._end = len(_MAGIC)
+        else:
+            self._file = open(path, "rb" if mode == "r" else "r+b")
+            self._index, end = _last_index(self._file,
+                                           os.path.getsize(path))
+            if self._index is None:
+                self._file.close()
+                raise ValueError("%s is not a stimulus archive" % path)
+            # 追記は古いfooterの後ろから (close()まで古いindexは有効)
+            self._end = end
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def keys(self):
+        """
+        Return the stored keys in insertion order.
+        """
+        return list(self._index)
+
+    def info(self, key):
+        """
+        Return srate, shape and params of a stimulus.
+        """
+        entry = self._index[key]
+        return {"srate": entry["srate"], "shape": tuple(entry["shape"]),
+                "params": entry["params"]}
+
+    def find(self, **params):
+        """
+        Return the keys whose params contain all given values.
+        """
+        return [key for key, entry in self._index.items()
+                if all(entry["params"].get(k) == v for k, v in params.items())]
+
+    def add(self, key, signal, srate, params=None, chunk=65536,
+            compression="zlib", level=6):
+        """
+        Store a stimulus.
+
+        Parameters
+        ----------
+        key : str
+            Unique name of the stimulus.
+        signal : ndarray()
+            shape: (n,) or (n, channels). Stored as 32-bit float.
+        srate : int
+            Sampling rate in Hz.
+        params : dict
+            JSON-serializable generation parameters for find().(optional)
+        chunk : int
+            Frames per chunk.(optional)
+        compression : str
+            "zlib" (byte-shuffled, lossless) or "none".(optional)
+        level : int
+            zlib compression level.(optional)
+        """
+        if self.mode == "r":
+            raise IOError("archive is opened read-only")
+        if key in self._index:
+            raise KeyError("%s is already stored" % key)
+        if compression not in ("zlib", "none"):
+            raise ValueError("unknown compression: %s" % compression)
+
+        signal = np.asarray(signal, dtype=np.float32)
+        frames = signal.reshape(len(signal), -1)
+
+        self._file.seek(self._end)
+        chunks = []
+        for start in range(0, len(frames), chunk):
+            data = np.ascontiguousarray(frames[start:start + chunk])
+            if compression == "zlib":
+                raw = zlib.compress(_shuffle(data), level)
+            else:
+                raw = data.tobytes()
+            chunks.append([self._end, len(raw)])
+            self._file.write(raw)
+            self._end += len(raw)
+
+        self._index[key] = {"srate": int(srate), "shape": list(signal.shape),
+                            "chunk": chunk, "compression": compression,
+                            "chunks": chunks, "params": params or {}}
+        self._added = True
+
+    def add_wav(self, file_name, key=None, params=None, **kwargs):
+        """
+        Store a wav file. The key defaults to the file name.
+        """
+        srate, data = wavfile.read(file_name)
+        self.add(key or os.path.basename(file_name), data, srate, params,
+                 **kwargs)
+
+    def read(self, key, start=0, stop=None):
+        """
+        Read a stimulus or a range of frames.
+
+        Parameters
+        ----------
+        key : str
+            Name of the stimulus.
+        start : int
+            First frame.(optional)
+        stop : int
+            End frame (exclusive). Default is the end.(optional)
+
+        Returns
+        -------
+        Signal in ndarray() (float32) with the stored shape.
+        """
+        entry = self._index[key]
+        shape = entry["shape"]
+        n = shape[0]
+        channels = int(np.prod(shape[1:], dtype=int))
+        stop = n if stop is None else min(stop, n)
+        start = max(start, 0)
+        if stop <= start:
+            return np.zeros((0,) + tuple(shape[1:]), dtype=np.float32)
+
+        chunk = entry["chunk"]
+        first = start // chunk
+        last = (stop - 1) // chunk
+        parts = []
+        for i in range(first, last + 1):
+            offset, size = entry["chunks"][i]
+            self._file.seek(offset)
+            raw = self._file.read(size)
+            if entry["compression"] == "zlib":
+                data = _unshuffle(zlib.decompress(raw))
+            else:
+                data = np.frombuffer(raw, dtype=np.float32)
+            parts.append(data.reshape(-1, channels))
+        frames = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        lo = start - first * chunk
+        return frames[lo:lo + stop - start].reshape(
+            (stop - start,) + tuple(shape[1:]))
+
+    def close(self):
+        """
+        Write the index (write/append mode) and close the file.
+        """
+        if self._file.closed:
+            return
+        if self.mode == "w" or (self.mode == "a" and self._added):
+            self._file.seek(self._end)
+            self._file.write(json.dumps(self._index).encode())
+            self._file.write(_FOOTER.pack(self._end, _MAGIC))
+            self._file.truncate()
+        self._file.close()
@@ -1,9 +1,13 @@
 import numpy as np
-import pyloudnorm as pyln
-from scipy.io.wavfile import write
+import fftbackend
+import lazy
 
+pyln = lazy.load("pyloudnorm")
+wavfile = lazy.load("scipy.io.wavfile")
 
-def generate(srate: int, duration: int, bwd: int, centre: int, type: str):
+
+def generate(srate: int, duration: int, bwd: int, centre: int, type: str,
+             file_name: str = "bandpass.wav", wav: bool = True):
     """
     Generate a Band Pass Noise signal.
     Requires:
@@ -24,6 +28,10 @@ def generate(srate: int, duration: int, bwd: int, centre: int, type: str):
         Centre frequency of bandpass filter in Hz.
     type : str
         Type of signal. Either "Stereo" or "Mono".
+    file_name : str
+        Output file name.(optional)
+    wav : bool
+        Output wav file or not. If False, return the signal.(optional)
 
     Returns
     -------
@@ -62,7 +70,7 @@ def generate(srate: int, duration: int, bwd: int, centre: int, type: str):
     fsig = np.hstack([fsig_left, fsig_right])
 
     # IFFT
-    sig = np.real(np.fft.ifft(fsig)) * 100
+    sig = np.real(fftbackend.ifft(fsig)) * 100
 
     # cast
     sig = sig.astype(np.float32)
@@ -73,8 +81,6 @@ def generate(srate: int, duration: int, bwd: int, centre: int, type: str):
         sig_n = pyln.normalize.loudness(sig, lufs_sorc, lufs_targ)
 
         output = np.vstack([sig_n, sig_n])
-
-        write("bandpass.wav", srate, output.T)
     elif type == "Stereo":
         arg_r = np.random.normal(0, np.pi, bwd_bin)
         fsig_inbwd_r = np.ndarray((0, np.size(bwd_bin)))
@@ -90,7 +96,7 @@ def generate(srate: int, duration: int, bwd: int, centre: int, type: str):
         fsig_r = np.hstack([fsig_left, fsig_right_r])
 
         # IFFT
-        sig_r = np.real(np.fft.ifft(fsig_r)) * 100
+        sig_r = np.real(fftbackend.ifft(fsig_r)) * 100
 
         # cast
         sig_r = sig_r.astype(np.float32)
@@ -103,4 +109,7 @@ def generate(srate: int, duration: int, bwd: int, centre: int, type: str):
 
         output = np.vstack([sig_n_l, sig_n_r])
 
-        write("bandpass.wav", srate, output.T)
+    if wav:
+        wavfile.write(file_name, srate, output.T)
+    else:
+        return output.T
@@ -0,0 +1,87 @@
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+MODULES = ("akeroyd", "bandpass", "binaural_beat", "channels", "level",
+           "modulation", "oscar", "pd_shift", "phase_delay", "phasewarp",
+           "wavplot")
+
+
+def _spawn(code):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True)
+    return time.perf_counter() - start
+
+
+def import_time(module, repeat=5):
+    """
+    Measure the import time of a module in a fresh interpreter.
+    Requires:
+        numpy
+
+    Parameters
+    ----------
+    module : str
+        Module name.
+    repeat : int
+        Number of interpreter launches.(optional)
+
+    Returns
+    -------
+    Median import time in seconds, without interpreter start-up and numpy.
+    """
+    base = [_spawn("import numpy") for _ in range(repeat)]
+    full = [_spawn("import %s" % module) for _ in range(repeat)]
+    return max(float(np.median(full) - np.median(base)), 0.0)
+
+
+def parallel_speedup(srate=48000, duration=60, repeat=3):
+    """
+    Compare serial and thread-parallel channel synthesis of akeroyd.
+    Requires:
+        numpy
+        pyloudnorm
+
+    Parameters
+    ----------
+    srate : int
+        Sampling rate.(optional)
+    duration : int
+        Stimulus duration in seconds.(optional)
+    repeat : int
+        Number of runs, the fastest is used.(optional)
+
+    Returns
+    -------
+    (serial seconds, parallel seconds)
+    """
+    import akeroyd
+
+    params = {"srate": srate, "shift": 2, "duration": duration, "bwd": 400,
+              "centre": 500, "init_direction": "left"}
+    times = []
+    for parallel in (False, True):
+        best = np.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            akeroyd.Generate(parallel=parallel, **params)
+            best = min(best, time.perf_counter() - start)
+        times.append(best)
+    return tuple(times)
+
+
+def main():
+    print("import time (excluding interpreter and numpy)")
+    for module in MODULES:
+        print("  %-14s %7.1f ms" % (module, import_time(module) * 1000))
+
+    serial, parallel = parallel_speedup()
+    print("akeroyd 60 s: serial %.2f s, parallel %.2f s (x%.2f)"
+          % (serial, parallel, serial / parallel))
+
+
+if __name__ == "__main__":
+    main()
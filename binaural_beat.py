@@ -1,6 +1,11 @@
 import numpy as np
-import pyloudnorm as pyln
-from scipy.io.wavfile import write
+import channels
+import trajectory
+import loudness
+import lazy
+
+pyln = lazy.load("pyloudnorm")
+wavfile = lazy.load("scipy.io.wavfile")
 
 
 def GenerateNoise(**kwargs):
@@ -27,11 +32,14 @@ def GenerateNoise(**kwargs):
       Output file name.(optional)
     wav : bool
       Output wav file or not. If True, output wavfile.(optional)
+    parallel : bool
+      Synthesize and normalize the two channels concurrently in threads.
+      The output is the same.(optional)
     --------
     Output signal in 32-bit float wav format at current directory.
     """
     lufs_targ = -17
-    meter = pyln.Meter(kwargs["srate"])
+    parallel = "parallel" in kwargs and kwargs["parallel"]
 
     if "file_name" in kwargs:
         file_name = kwargs["file_name"]
@@ -59,40 +67,32 @@ def GenerateNoise(**kwargs):
     fsig_left = np.hstack([dc, btm_zero, fsig_inbwd, top_zero])
 
     # 複素共役
-    fsig_right = np.conj(np.flipud(fsig_left[1:nq_bin]))
-    fsig = np.hstack([fsig_left, fsig_right])
+    rows = 2 if kwargs["phase"] == "normal" else 1
+    spec = np.empty((rows, 2 * nq_bin), dtype=complex)
+    channels.hermitian(spec[0], fsig_left, nq_bin)
 
-    # IFFT
-    tsig = np.real(np.fft.ifft(fsig))*100
-
-    # Rチャンネル
+    # Rチャンネル, IFFT, cast
     if kwargs["phase"] == "same":
+        tsig, = channels.synthesize(spec)
         tsig_r = tsig
     elif kwargs["phase"] == "anti":
+        tsig, = channels.synthesize(spec)
         tsig_r = -tsig
     elif kwargs["phase"] == "normal":
         fsig_r_inbwd = np.random.normal(size=bwd_bin) + 1j * \
             np.random.normal(size=bwd_bin)
         fsig_r_left = np.hstack([dc, btm_zero, fsig_r_inbwd, top_zero])
-        fsig_r_right = np.conj(np.flipud(fsig_r_left[1:nq_bin]))
-        fsig_r = np.hstack([fsig_r_left, fsig_r_right])
-        tsig_r = np.real(np.fft.ifft(fsig_r))*100
-
-    # cast
-    tsig = tsig.astype(np.float32)
-    tsig_r = tsig_r.astype(np.float32)
+        channels.hermitian(spec[1], fsig_r_left, nq_bin)
+        tsig, tsig_r = channels.synthesize(spec, parallel)
 
     # normalize
-    lufs_sorc_l = meter.integrated_loudness(tsig)
-    lufs_sorc_r = meter.integrated_loudness(tsig_r)
-
-    tsig_n = pyln.normalize.loudness(tsig, lufs_sorc_l, lufs_targ)
-    tsig_r_n = pyln.normalize.loudness(tsig_r, lufs_sorc_r, lufs_targ)
+    tsig_n, tsig_r_n = channels.normalize([tsig, tsig_r], kwargs["srate"],
+                                          lufs_targ, parallel)
 
     sig = np.vstack([tsig_n, tsig_r_n])
 
     if "wav" in kwargs:
-        write(file_name, kwargs["srate"], sig.T)
+        wavfile.write(file_name, kwargs["srate"], sig.T)
     else:
         return sig.T
 
@@ -121,6 +121,10 @@ def Generate(**kwargs):
       Output file name.(optional)
     wav : bool
       Output wav file or not. If True, output wavfile.(optional)
+    loudness : str
+      "analytic": normalization gain from the K-weighted power of the
+      tone, no meter. "meter": measure with pyloudnorm. "verify": analytic
+      and check the result with the meter. (default is analytic)
 
     Returns
     -------
@@ -131,7 +135,10 @@ def Generate(**kwargs):
         lufs_targ = kwargs["LUFS"]
     else:
       lufs_targ = -17
-    meter = pyln.Meter(kwargs["srate"])
+    if "loudness" in kwargs:
+        mode = kwargs["loudness"]
+    else:
+        mode = "analytic"
 
     if "file_name" in kwargs:
         file_name = kwargs["file_name"]
@@ -147,6 +154,87 @@ def Generate(**kwargs):
     sig_r = np.sin(np.linspace(
         0, 2 * np.pi * (kwargs["freq"] + kwargs["shift"]) * kwargs["duration"], length))
 
+    # normalize
+    if mode == "meter":
+        meter = pyln.Meter(kwargs["srate"])
+        lufs_sorc_l = meter.integrated_loudness(sig_l)
+        lufs_sorc_r = meter.integrated_loudness(sig_r)
+
+        sig_l_n = pyln.normalize.loudness(sig_l, lufs_sorc_l, lufs_targ)
+        sig_r_n = pyln.normalize.loudness(sig_r, lufs_sorc_r, lufs_targ)
+    else:
+        verify = mode == "verify"
+        sig_l_n = loudness.normalize_tone(sig_l, kwargs["srate"],
+                                          kwargs["freq"], lufs_targ,
+                                          verify=verify)
+        sig_r_n = loudness.normalize_tone(sig_r, kwargs["srate"],
+                                          kwargs["freq"] + kwargs["shift"],
+                                          lufs_targ, verify=verify)
+
+    # 信号を出力
+    sig = np.vstack([sig_l_n, sig_r_n])
+    if "wav" in kwargs:
+        wavfile.write(file_name, kwargs["srate"], sig.T)
+    else:
+        return sig.T
+
+
+def GenerateSweep(**kwargs):
+    """
+    Generate Binaural Beat signal with pure tones and a time-varying shift
+    frequency. The right channel is phase-continuous over the whole signal.
+    Requires:
+      pyloudnorm
+      numpy
+      scipy
+
+    Parameters
+    ----------
+    srate : int
+      Sampling rate.
+    shift : float, ndarray() or list
+      Shift frequency in Hz. A constant, an array spread evenly over the
+      duration, or breakpoints [(time in seconds, Hz), ...] interpolated
+      linearly.
+    duration : int
+      Total duration in seconds.
+    freq : int
+      Frequency of pure tone in Hz.
+    LUFS : int
+      Loudness in LUFS. Default is -17.(optional)
+    file_name : str
+      Output file name.(optional)
+    wav : bool
+      Output wav file or not. If True, output wavfile.(optional)
+
+    Returns
+    -------
+    Output signal in 32-bit float wav format at current directory.
+    """
+
+    if "LUFS" in kwargs:
+        lufs_targ = kwargs["LUFS"]
+    else:
+        lufs_targ = -17
+    meter = pyln.Meter(kwargs["srate"])
+
+    if "file_name" in kwargs:
+        file_name = kwargs["file_name"]
+    else:
+        file_name = "%s_sweep.wav" % kwargs["freq"]
+
+    # sample数を決定
+    length = kwargs["duration"] * kwargs["srate"]
+
+    # shift周波数の軌跡を位相に積分
+    shift = trajectory.resolve(kwargs["shift"], kwargs["srate"], length)
+    phase_l = 2 * np.pi * kwargs["freq"] * np.arange(length) / kwargs["srate"]
+    phase_r = phase_l + trajectory.cumulative_phase(shift, kwargs["srate"])
+
+    # 信号を生成
+    sig_l = np.sin(phase_l)
+    sig_r = np.sin(phase_r)
+
     # normalize
     lufs_sorc_l = meter.integrated_loudness(sig_l)
     lufs_sorc_r = meter.integrated_loudness(sig_r)
@@ -157,6 +245,6 @@ def Generate(**kwargs):
     # 信号を出力
     sig = np.vstack([sig_l_n, sig_r_n])
     if "wav" in kwargs:
-        write(file_name, kwargs["srate"], sig.T)
+        wavfile.write(file_name, kwargs["srate"], sig.T)
     else:
         return sig.T
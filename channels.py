@@ -0,0 +1,115 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import fftbackend
+import lazy
+
+pyln = lazy.load("pyloudnorm")
+
+
+_pool = {}
+
+
+def _executor():
+    # プロセス内で1つだけ作る
+    if "threads" not in _pool:
+        _pool["threads"] = ThreadPoolExecutor(max_workers=2)
+    return _pool["threads"]
+
+
+def _map(func, items, parallel):
+    if parallel and len(items) > 1:
+        return list(_executor().map(func, items))
+    return [func(item) for item in items]
+
+
+def hermitian(out, left, nq_bin):
+    """
+    Write a full (conjugate-symmetric) spectrum into a preallocated row.
+
+    Parameters
+    ----------
+    out : ndarray()
+        Complex row of the output buffer, length len(left) + nq_bin - 1.
+    left : ndarray()
+        Bins from DC upwards.
+    nq_bin : int
+        Nyquist bin. Bins 1 to nq_bin - 1 are mirrored.
+    """
+    out[:len(left)] = left
+    out[len(left):] = np.conj(left[nq_bin - 1:0:-1])
+
+
+def synthesize(spectra, parallel=False, scale=100):
+    """
+    IFFT (real part) and cast to 32-bit float for each channel.
+    Requires:
+        numpy
+
+    Parameters
+    ----------
+    spectra : ndarray() or list of ndarray()
+        Full (conjugate-symmetric) spectrum of each channel. A complex
+        (channels, n) buffer (see hermitian()) is transformed in place
+        and must not be used afterwards.
+    parallel : bool
+        Run the channels concurrently in threads. The FFT backend releases
+        the GIL; its threads are split between the channels. Otherwise
+        all channels go through one batched (channels, n) IFFT, which
+        scipy.fft spreads over its workers.(optional)
+    scale : float
+        Gain applied after the IFFT.(optional)
+
+    Returns
+    -------
+    List of 32-bit float ndarray().
+    """
+    if not parallel:
+        if isinstance(spectra, np.ndarray):
+            buf = spectra
+        else:
+            buf = np.empty((len(spectra), len(spectra[0])), dtype=complex)
+            for row, spec in zip(buf, spectra):
+                row[...] = spec
+        # scipy.fftのworkersはbatch方向にのみ並列化する
+        sigs = fftbackend.ifft(buf, axis=-1, overwrite=True).real * scale
+        return list(sigs.astype(np.float32))
+
+    workers = max(1, fftbackend.get_backend()[1] // len(spectra))
+
+    def one(spec):
+        sig = np.real(fftbackend.ifft(spec, workers=workers)) * scale
+        return sig.astype(np.float32)
+
+    return _map(one, list(spectra), parallel)
+
+
+def normalize(signals, srate, lufs_targ, parallel=False):
+    """
+    Normalize each channel to the target integrated loudness.
+    Requires:
+        pyloudnorm
+        numpy
+
+    Parameters
+    ----------
+    signals : list of ndarray()
+        One signal per channel.
+    srate : int
+        Sampling rate.
+    lufs_targ : float
+        Target loudness in LUFS.
+    parallel : bool
+        Measure the channels concurrently in threads.(optional)
+
+    Returns
+    -------
+    List of normalized ndarray().
+    """
+    def one(sig):
+        meter = pyln.Meter(srate)
+        lufs_sorc = meter.integrated_loudness(sig)
+        return pyln.normalize.loudness(sig, lufs_sorc, lufs_targ)
+
+    return _map(one, signals, parallel)
+
@@ -0,0 +1,275 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import fftbackend
+import pcm
+import lazy
+
+sf = lazy.load("soundfile")
+
+
+_cache = OrderedDict()
+_CACHE_SIZE = 32
+
+
+def _matrix(filters, channels):
+    # (taps,2) はチャンネル毎 (対角), モノラル入力なら (taps,1,2)
+    filters = np.asarray(filters, dtype=float)
+    if filters.ndim == 1:
+        filters = filters[:, np.newaxis]
+    if filters.ndim == 2 and channels == 1 and filters.shape[1] > 1:
+        return filters[:, np.newaxis, :], False
+    if filters.ndim == 2:
+        if filters.shape[1] != channels:
+            raise ValueError("%d filters for %d channels"
+                             % (filters.shape[1], channels))
+        return filters, True
+    if filters.shape[1] != channels:
+        raise ValueError("filters for %d inputs, signal has %d channels"
+                         % (filters.shape[1], channels))
+    return filters, False
+
+
+def filter_spectra(filters, block):
+    """
+    Partitioned spectra of a filter set, cached per set and block size.
+    Requires:
+        numpy
+
+    Parameters
+    ----------
+    filters : ndarray()
+        shape: (taps, channels) or (taps, inputs, outputs)
+    block : int
+        Partition length in samples.
+
+    Returns
+    -------
+    Read-only complex ndarray(), shape: (partitions, block + 1, ...)
+    """
+    filters = np.ascontiguousarray(filters, dtype=float)
+    key = (hashlib.sha1(filters.tobytes()).hexdigest(), filters.shape, block)
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    taps = len(filters)
+    parts = -(-taps // block)
+    # ゼロ詰めして block 毎に分割
+    padded = np.zeros((parts * block,) + filters.shape[1:])
+    padded[:taps] = filters
+    padded = padded.reshape((parts, block) + filters.shape[1:])
+    spec = fftbackend.rfft(padded, n=2 * block, axis=1)
+    spec.flags.writeable = False
+
+    _cache[key] = spec
+    if len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+    return spec
+
+
+class Convolver:
+    """
+    Uniformly partitioned overlap-save convolution for streaming HRIR
+    rendering of one stimulus or a batch of stimuli.
+
+    The filter is split into partitions of `block` samples whose spectra
+    are cached; each input block costs one real FFT, one multiply-add per
+    partition and one inverse FFT, with a latency of zero samples.
+    Requires:
+        numpy
+
+    Parameters
+    ----------
+    filters : ndarray()
+        shape: (taps, 2): one impulse response per channel, e.g. the left
+        and right ear HRIR applied to the left and right channel of a
+        stimulus. For a mono input both are applied to the one channel.
+        shape: (taps, inputs, outputs): full filter matrix, e.g. HRIRs of
+        virtual loudspeakers.
+    channels : int
+        Number of input channels. (default is 2)
+    block : int
+        Block and partition length in samples.(optional)
+    """
+
+    def __init__(self, filters, channels=2, block=1024):
+        self.filters, self.diagonal = _matrix(filters, channels)
+        self.block = block
+        self.channels = channels
+        self.taps = len(self.filters)
+        self.spec = filter_spectra(self.filters, block)
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the input history.
+        """
+        self._fdl = None
+        self._prev = None
+        self._pending = None
+        self._single = True
+
+    def process(self, x):
+        """
+        Convolve one block.
+
+        Parameters
+        ----------
+        x : ndarray()
+            shape: (m, channels) or (stimuli, m, channels) with m <= block.
+            Only the last block may be shorter than block.
+
+        Returns
+        -------
+        Output block in ndarray(), shape: (m, outputs) or
+        (stimuli, m, outputs).
+        """
+        x = np.asarray(x)
+        single = x.ndim == 2
+        if single:
+            x = x[np.newaxis]
+        self._single = single
+        batch, m, _ = x.shape
+        if m > self.block:
+            raise ValueError("block of %d samples, at most %d"
+                             % (m, self.block))
+
+        if self._fdl is None or self._fdl.shape[1] != batch:
+            parts = len(self.spec)
+            self._fdl = np.zeros((parts, batch, self.block + 1,
+                                  self.channels), dtype=complex)
+            self._prev = np.zeros((batch, self.block, self.channels))
+
+        # 前のblockと合わせて 2*block 点
+        frame = np.zeros((batch, 2 * self.block, self.channels))
+        frame[:, :self.block] = self._prev
+        frame[:, self.block:self.block + m] = x
+        self._prev = frame[:, self.block:].copy()
+
+        # 周波数領域の遅延線
+        self._fdl[1:] = self._fdl[:-1]
+        self._fdl[0] = fftbackend.rfft(frame, axis=1)
+
+        if self.diagonal:
+            acc = np.einsum("psfc,pfc->sfc", self._fdl, self.spec)
+        else:
+            acc = np.einsum("psfi,pfio->sfo", self._fdl, self.spec)
+        y = fftbackend.irfft(acc, n=2 * self.block, axis=1)[:, self.block:]
+        y = y.astype(np.result_type(x, np.float32), copy=False)
+        # 短いblockの残りはtailの先頭
+        self._pending = y[:, m:]
+        return y[0, :m] if single else y[:, :m]
+
+    def tail(self):
+        """
+        Return the remaining taps - 1 samples after the last block.
+
+        Returns
+        -------
+        ndarray(), shape: (taps - 1, outputs) or (stimuli, taps - 1, outputs)
+        """
+        single = self._single
+        batch = 1 if self._prev is None else self._prev.shape[0]
+        outputs = self.spec.shape[-1]
+        out = [np.zeros((batch, 0, outputs)) if self._pending is None
+               else self._pending]
+        remain = self.taps - 1 - out[0].shape[1]
+        while remain > 0:
+            out.append(self.process(np.zeros((batch, self.block,
+                                              self.channels))))
+            remain -= self.block
+        out = np.concatenate(out, axis=1)[:, :self.taps - 1]
+        return out[0] if single else out
+
+
+def convolve(signals, filters, block=1024, tail=False):
+    """
+    Render whole stimuli through a filter set.
+
+    Parameters
+    ----------
+    signals : ndarray()
+        shape: (n,), (n, channels) or (stimuli, n, channels), e.g. the
+        arrays returned by akeroyd.Generate() or binaural_beat.Generate().
+        A batch of stimuli shares the cached filter spectra and every FFT.
+    filters : ndarray()
+        See Convolver.
+    block : int
+        Block and partition length in samples.(optional)
+    tail : bool
+        Append the taps - 1 samples of the filter tail. If False, the
+        output has the input length.(optional)
+
+    Returns
+    -------
+    Output signal in ndarray(), shape: (n, outputs) or
+    (stimuli, n, outputs).
+    """
+    signals = np.asarray(signals)
+    if signals.ndim == 1:
+        signals = signals[:, np.newaxis]
+    single = signals.ndim == 2
+    if single:
+        signals = signals[np.newaxis]
+
+    conv = Convolver(filters, signals.shape[2], block)
+    n = signals.shape[1]
+    parts = [conv.process(signals[:, start:start + block])
+             for start in range(0, n, block)]
+    if tail:
+        parts.append(conv.tail())
+    out = np.concatenate(parts, axis=1)
+    return out[0] if single else out
+
+
+def convolve_file(in_file, out_file, filters, block=4096, tail=True,
+                  format="float32"):
+    """
+    Render a wav file through a filter set block by block.
+    Requires:
+        numpy
+        pysoundfile
+
+    Parameters
+    ----------
+    in_file : str
+        Input wav file path.
+    out_file : str
+        Output wav file path.
+    filters : ndarray()
+        See Convolver.
+    block : int
+        Block and partition length in samples.(optional)
+    tail : bool
+        Append the filter tail.(optional)
+    format : str
+        Output sample format, see pcm.FORMATS. (default is float32)
+
+    Returns
+    -------
+    pcm.ClipStats of the output.
+    """
+    with sf.SoundFile(in_file) as src:
+        conv = Convolver(filters, src.channels, block)
+        outputs = conv.spec.shape[-1]
+        with pcm.Writer(out_file, src.samplerate, outputs, format) as dst:
+            for data in src.blocks(blocksize=block, dtype="float32",
+                                   always_2d=True):
+                dst.write(conv.process(data))
+            if tail:
+                dst.write(conv.tail())
+    return dst.stats
+
+
+def load_hrir(file_name):
+    """
+    Read an HRIR pair (or any filter set) from a wav file.
+
+    Returns
+    -------
+    (filters in ndarray(), shape: (taps, channels), sampling rate)
+    """
+    data, srate = sf.read(file_name, dtype="float64", always_2d=True)
+    return data, srate
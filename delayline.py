@@ -0,0 +1,208 @@
+import functools
+
+import numpy as np
+import trajectory
+import pcm
+import lazy
+
+sf = lazy.load("soundfile")
+
+
+@functools.lru_cache(maxsize=8)
+def _table(half, beta, steps):
+    """
+    Kaiser-windowed sinc kernels for fractional delays 0 to 1 in steps
+    (shape: (steps + 1, 2 * half)). Kernels in between are interpolated
+    linearly, so no sinc is evaluated per sample.
+    """
+    frac = np.arange(steps + 1) / steps
+    taps = np.arange(-half + 1, half + 1)
+    # 読み出し位置からの距離
+    x = taps[np.newaxis, :] - frac[:, np.newaxis]
+    window = np.i0(beta * np.sqrt(np.clip(1 - (x / half) ** 2, 0, 1))) \
+        / np.i0(beta)
+    table = np.sinc(x) * window
+    table.flags.writeable = False
+    return table
+
+
+class DelayLine:
+    """
+    Streaming fractional delay line applying a time-varying ITD to a
+    stereo signal (windowed-sinc interpolation, vectorized per block).
+    Memory does not depend on the signal length.
+
+    The output has a fixed latency of `latency` samples: the first samples
+    returned by process() belong to the time before the input started, and
+    flush() returns the last ones. apply() and apply_file() compensate it.
+    Requires:
+        numpy
+
+    Parameters
+    ----------
+    srate : int
+        Sampling rate in Hz.
+    itd : float, ndarray() or list
+        ITD trajectory in milliseconds, see trajectory.resolve(). Positive
+        values delay the right channel, negative values the left channel.
+    length : int
+        Total number of samples. Only needed for array trajectories.
+        (optional)
+    half : int
+        Half length of the interpolation kernel in samples.(optional)
+    beta : float
+        Kaiser window parameter.(optional)
+    steps : int
+        Resolution of the kernel table per sample.(optional)
+    """
+
+    def __init__(self, srate, itd, length=None, half=16, beta=8.0,
+                 steps=512):
+        if np.ndim(itd) == 0:
+            max_itd = abs(itd)
+        elif np.ndim(itd) == 2:
+            max_itd = np.max(np.abs(np.asarray(itd, dtype=float)[:, 1]))
+        else:
+            if length is None:
+                raise ValueError("array trajectories need length")
+            max_itd = np.max(np.abs(itd))
+
+        self.srate = srate
+        self.itd = itd
+        self.length = length
+        self.half = half
+        self.steps = steps
+        self.latency = half
+        self._table = _table(half, beta, steps)
+        self._taps = np.arange(-half + 1, half + 1)
+        max_delay = int(np.ceil(max_itd * srate / 1000)) + 1
+        self._history = np.zeros((2 * half + max_delay, 2))
+        self._pos = 0
+
+    def process(self, block):
+        """
+        Delay one block.
+
+        Parameters
+        ----------
+        block : ndarray()
+            shape: (n,2)
+
+        Returns
+        -------
+        Delayed block in ndarray(), shape: (n,2), `latency` samples late.
+        """
+        block = np.asarray(block)
+        n = len(block)
+        ext = np.concatenate([self._history, block])
+        base = self._pos - len(self._history)
+
+        # 出力サンプルの時刻 (latency分遅れ)
+        time = np.arange(self._pos, self._pos + n) - self.half
+        itd = trajectory.resolve_range(self.itd, self.srate, self.length,
+                                       time[0], time[-1] + 1) \
+            if n else np.zeros(0)
+        delay = itd * self.srate / 1000
+
+        out = np.empty((n, 2), dtype=np.result_type(block, np.float32))
+        for ch, d in enumerate((np.maximum(-delay, 0),
+                                np.maximum(delay, 0))):
+            pos = time - d - base
+            index = np.floor(pos)
+            # 分数遅延の表を線形補間
+            frac = (pos - index) * self.steps
+            row = frac.astype(int)
+            a = (frac - row)[:, np.newaxis]
+            kernel = self._table[row] * (1 - a) + \
+                self._table[np.minimum(row + 1, self.steps)] * a
+            taps = index.astype(int)[:, np.newaxis] + self._taps
+            out[:, ch] = np.sum(ext[taps, ch] * kernel, axis=1)
+
+        self._history = ext[len(ext) - len(self._history):]
+        self._pos += n
+        return out
+
+    def flush(self):
+        """
+        Return the last `latency` samples held in the line.
+        """
+        return self.process(np.zeros((self.half, 2)))
+
+
+def apply(signal, srate, itd, block=8192, **kwargs):
+    """
+    Apply an ITD trajectory to a whole stereo signal.
+
+    Parameters
+    ----------
+    signal : ndarray()
+        shape: (n,2)
+    srate : int
+        Sampling rate in Hz.
+    itd : float, ndarray() or list
+        ITD trajectory in milliseconds, see DelayLine.
+    block : int
+        Block length in samples.(optional)
+    kwargs
+        Other DelayLine parameters.
+
+    Returns
+    -------
+    Delayed signal in ndarray(), shape: (n,2), aligned with the input.
+    """
+    signal = np.asarray(signal)
+    n = len(signal)
+    line = DelayLine(srate, itd, n, **kwargs)
+    out = np.empty((n, 2), dtype=np.result_type(signal, np.float32))
+    lag = line.latency
+
+    def put(y, lo):
+        # 出力のlo番目から; 先頭のlatency分は捨てる
+        if lo + len(y) > 0:
+            out[max(lo, 0):lo + len(y)] = y[max(-lo, 0):]
+
+    for start in range(0, n, block):
+        put(line.process(signal[start:start + block]), start - lag)
+    put(line.flush(), n - lag)
+    return out
+
+
+def apply_file(in_file, out_file, itd, block=65536, format="float32",
+               **kwargs):
+    """
+    Apply an ITD trajectory to a stereo wav file block by block.
+    Requires:
+        numpy
+        pysoundfile
+
+    Parameters
+    ----------
+    in_file : str
+        Input wav file path. (stereo)
+    out_file : str
+        Output wav file path.
+    itd : float, ndarray() or list
+        ITD trajectory in milliseconds, see DelayLine.
+    block : int
+        Block length in samples.(optional)
+    format : str
+        Output sample format, see pcm.FORMATS. (default is float32)
+    kwargs
+        Other DelayLine parameters.
+
+    Returns
+    -------
+    pcm.ClipStats of the output.
+    """
+    with sf.SoundFile(in_file) as src:
+        line = DelayLine(src.samplerate, itd, src.frames, **kwargs)
+        skip = line.latency
+        with pcm.Writer(out_file, src.samplerate, 2, format) as dst:
+            for data in src.blocks(blocksize=block, dtype="float32",
+                                   always_2d=True):
+                y = line.process(data[:, :2])
+                # 先頭のlatency分は捨てる
+                dst.write(y[skip:])
+                skip = max(skip - len(y), 0)
+            dst.write(line.flush()[skip:])
+    return dst.stats
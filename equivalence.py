@@ -0,0 +1,406 @@
+import argparse
+import math
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+import fftbackend
+
+
+@dataclass(frozen=True)
+class Case:
+    """
+    One optimized path checked against its reference.
+
+    Parameters
+    ----------
+    name : str
+        Name shown in the report.
+    reference : callable
+        Reference implementation, no arguments, returns ndarray().
+    optimized : callable
+        Optimized path, no arguments, returns ndarray().
+    samples : int
+        Output samples per call, for the throughput.
+    sample_tol : float
+        Largest allowed sample difference relative to the reference peak.
+    spectral_tol : float
+        Largest allowed magnitude spectrum difference in dB (bins within
+        60 dB of the spectral peak).
+    seed : int
+        np.random seed set before each call.
+    measure : callable
+        Applied to both outputs before comparing, for paths that agree
+        only in a derived quantity (e.g. the IPD).(optional)
+    """
+    name: str
+    reference: Callable
+    optimized: Callable
+    samples: int
+    sample_tol: float = 1e-6
+    spectral_tol: float = 1e-3
+    seed: int = 1234
+    measure: Callable = None
+
+
+def _backend(name, func):
+    # 一時的にFFT backendを切り替えて実行
+    def call():
+        previous = fftbackend.get_backend()
+        fftbackend.set_backend(name)
+        try:
+            return func()
+        finally:
+            fftbackend.set_backend(*previous)
+    return call
+
+
+def _sin_loop(srate, freq, length):
+    # modulation.SinModの元のループ実装
+    phi = freq / srate
+    sin_sig = np.zeros(length)
+    for i in range(length):
+        sin_sig[i] = np.sin(2 * np.pi * phi * i + (3/2)*np.pi)
+    return sin_sig
+
+
+def _halfsin_loop(srate, freq, length):
+    # modulation.HalfSinModの元のループ実装
+    phi = freq / srate
+    sin_sig = np.zeros(length)
+    for i in range(length):
+        if (i // (1 / phi)) % 2 == 0:
+            sin_sig[i] = np.sin(2 * np.pi * phi * i + ((3/2)*np.pi))
+        else:
+            sin_sig[i] = -1
+    return sin_sig
+
+
+def _am(signal, sin_sig, depth):
+    mod = (1 + depth * sin_sig) / (1 + depth)
+    return signal * mod[:, np.newaxis]
+
+
+def _hermitian_ifft(spec):
+    # 片側スペクトルから全帯域を組んで複素IFFT (元の実装の構成)
+    full = np.hstack([spec, np.conj(np.flipud(spec[1:-1]))])
+    return np.real(np.fft.ifft(full))
+
+
+def _normalize(sig_l, sig_r, srate, lufs_targ):
+    import pyloudnorm as pyln
+
+    meter = pyln.Meter(srate)
+    sig_l = sig_l.astype(np.float32)
+    sig_r = sig_r.astype(np.float32)
+    sig_l_n = pyln.normalize.loudness(
+        sig_l, meter.integrated_loudness(sig_l), lufs_targ)
+    sig_r_n = pyln.normalize.loudness(
+        sig_r, meter.integrated_loudness(sig_r), lufs_targ)
+    return np.vstack([sig_l_n, sig_r_n]).T
+
+
+def _oscar_loop(srate, fcs, bwds, shifts, duration):
+    # 帯域毎の複素IFFTとmath.sinのサンプル毎の変調 (user-030以前の構成,
+    # 帯域雑音は実数になるよう修正済み, 乱数の順序はoscar.generateと同じ)
+    fs = srate * duration
+    nq_bin = int(fs / 2)
+    sig_l = np.zeros(2 * nq_bin)
+    shift_sig = np.zeros(2 * nq_bin)
+    bands = []
+    for fc, bwd in zip(fcs, bwds):
+        width = int(bwd * duration)
+        fdwn = int(fc * duration - width / 2)
+        specwid = np.random.normal(size=(2, width)) + 1j * \
+            np.random.normal(size=(2, width))
+        bands.append((fdwn, width, specwid))
+    for (fdwn, width, specwid), shift in zip(bands, shifts):
+        sig_BPN = []
+        for row in specwid:
+            spec = np.zeros(nq_bin + 1, dtype=complex)
+            spec[fdwn:fdwn + width] = row
+            sig_BPN.append(_hermitian_ifft(spec))
+
+        ln = 2 * math.pi * shift / srate  # 1サンプルの位相の大きさ
+        sin_sig = np.array([math.sin(ln * i) for i in range(fs)])
+        shft_sin_sig = np.array([math.sin(ln * i + math.pi / 2)
+                                 for i in range(fs)])
+        sig_l += sig_BPN[0] * sin_sig * 2
+        shift_sig += sig_BPN[1] * shft_sin_sig * 2
+    return _normalize(sig_l, sig_l + shift_sig, srate, -14)
+
+
+def _level_loop(srate, fc_i, bwd_i, shft_freq_i, duration):
+    # 複素IFFTとmath.cosのサンプル毎のpanning (user-029以前の構成,
+    # 帯域雑音は実数になるよう修正済み)
+    fs = srate * duration
+    nq_bin = int(fs / 2)
+    bwd = bwd_i * duration
+    fdwn = int(fc_i * duration - bwd / 2)
+
+    spec = np.zeros(nq_bin + 1, dtype=complex)
+    spec[fdwn:fdwn + bwd] = np.random.normal(size=bwd) + 1j * \
+        np.random.normal(size=bwd)
+    sig_base = _hermitian_ifft(spec)
+
+    ln = 2 * math.pi * shft_freq_i / srate  # 1sampleの位相の大きさ
+    cos_sig_l = np.array([(math.cos(ln * i) + 1) / 2 for i in range(fs)])
+    cos_sig_r = np.array([(math.cos(ln * i + math.pi) + 1) / 2
+                          for i in range(fs)])
+    return _normalize(sig_base * cos_sig_l * 10, sig_base * cos_sig_r * 10,
+                      srate, -14)
+
+
+def _ipd(srate, centre, bwd):
+    # IPDの軌跡を単位円上の点 (cos, sin) で返す
+    def measure(sig):
+        import analysis
+
+        _, ipd, _ = analysis.interaural(sig, srate, centre, bwd)
+        return np.stack([np.cos(ipd[0]), np.sin(ipd[0])], axis=1)
+    return measure
+
+
+def cases(srate=48000, duration=2):
+    """
+    The regression cases of the generators and modulation functions.
+
+    Parameters
+    ----------
+    srate : int
+        Sampling rate in Hz.(optional)
+    duration : int
+        Stimulus duration in seconds.(optional)
+
+    Returns
+    -------
+    List of Case.
+    """
+    import akeroyd
+    import bandpass
+    import binaural_beat
+    import level
+    import memplan
+    import modulation
+    import oscar
+    import pd_shift
+    import phase_delay
+    import phasewarp
+    import registry
+
+    n = srate * duration
+    noise = dict(srate=srate, duration=duration, bwd=400, centre=500)
+    shifted = dict(noise, shift=2, init_direction="left")
+    tone = dict(srate=srate, duration=duration, shift=4, freq=500)
+    fast = "scipy"
+    try:
+        import pyfftw  # noqa: F401
+        fast = "pyfftw"
+    except ImportError:
+        pass
+
+    def job(name, **params):
+        return registry.make(name, seed=1234, **params)
+
+    rng = np.random.default_rng(0)
+    carrier = rng.normal(size=(n, 2))
+    out = []
+
+    # akeroyd
+    out += [
+        Case("akeroyd.Generate parallel",
+             lambda: akeroyd.Generate(**shifted),
+             lambda: akeroyd.Generate(parallel=True, **shifted), n, 0, 0),
+        Case("akeroyd.Generate rfft",
+             lambda: akeroyd.Generate(**shifted),
+             lambda: memplan.run(job("akeroyd", **shifted), strategy="rfft"),
+             n, 0, 0),
+        Case("akeroyd.GenerateSweep constant",
+             lambda: akeroyd.Generate(**shifted),
+             lambda: akeroyd.GenerateSweep(**shifted), n, 1e-4, 1e-2),
+        Case("akeroyd.Generate %s" % fast,
+             _backend("numpy", lambda: akeroyd.Generate(**shifted)),
+             _backend(fast, lambda: akeroyd.Generate(**shifted)), n),
+        # 雑音の実現値は異なるのでIPDの軌跡で比べる
+        Case("akeroyd.GenerateInitIpd analytic IPD",
+             lambda: akeroyd.GenerateInitIpd(init_ipd=90, method="crop",
+                                             **shifted),
+             lambda: akeroyd.GenerateInitIpd(init_ipd=90, **shifted),
+             n, 0.2, np.inf, measure=_ipd(srate, 500, 400)),
+    ]
+    # binaural_beat
+    out += [
+        Case("binaural_beat.Generate analytic loudness",
+             lambda: binaural_beat.Generate(loudness="meter", **tone),
+             lambda: binaural_beat.Generate(**tone), n, 1e-3, 1e-2),
+        Case("binaural_beat.GenerateNoise parallel",
+             lambda: binaural_beat.GenerateNoise(phase="normal", **noise),
+             lambda: binaural_beat.GenerateNoise(phase="normal",
+                                                 parallel=True, **noise),
+             n, 0, 0),
+    ]
+    # pd_shift, phasewarp
+    for name, module, extra in (("pd_shift", pd_shift, {"delay": 1}),
+                                ("phasewarp", phasewarp, {})):
+        params = dict(shifted, **extra)
+        out += [
+            Case("%s.generate parallel" % name,
+                 lambda m=module, p=params: m.generate(wav=False, **p),
+                 lambda m=module, p=params: m.generate(wav=False,
+                                                       parallel=True, **p),
+                 n, 0, 0),
+            Case("%s.generate rfft" % name,
+                 lambda m=module, p=params: m.generate(wav=False, **p),
+                 lambda m=module, p=params, k=name:
+                     memplan.run(job(k, **p), strategy="rfft"),
+                 n, 0, 0),
+        ]
+    # FFT backend
+    for name, func in (
+            ("phase_delay.generate",
+             lambda: phase_delay.generate(srate, 1, duration, "right",
+                                          wav=False)),
+            ("bandpass.generate",
+             lambda: bandpass.generate(srate, duration, 400, 500, "Stereo",
+                                       wav=False)),
+            ("level.generate",
+             lambda: level.generate(srate, 500, 400, 2, duration, wav=False)),
+            ("oscar.generate",
+             lambda: oscar.generate(srate, [500, 1000], [100, 100], [2, 3],
+                                    duration, wav=False))):
+        out.append(Case("%s %s" % (name, fast), _backend("numpy", func),
+                        _backend(fast, func), n))
+    # 元の実装の構成 (複素IFFT, サンプル毎のループ)
+    out += [
+        Case("oscar.generate batched irfft",
+             lambda: _oscar_loop(srate, [500, 1000], [100, 100], [2, 3],
+                                 duration),
+             lambda: oscar.generate(srate, [500, 1000], [100, 100], [2, 3],
+                                    duration, wav=False), n),
+        Case("level.generate irfft and Pan",
+             lambda: _level_loop(srate, 500, 400, 2, duration),
+             lambda: level.generate(srate, 500, 400, 2, duration, wav=False),
+             n),
+    ]
+    # modulation
+    out += [
+        Case("modulation.SinMod",
+             lambda: _am(carrier, _sin_loop(srate, 4, n), 0.5),
+             lambda: modulation.SinMod(signal=carrier, srate=srate, freq=4,
+                                       depth=0.5), n, 0, 0),
+        Case("modulation.HalfSinMod",
+             lambda: _am(carrier, _halfsin_loop(srate, 4, n), 0.5),
+             lambda: modulation.HalfSinMod(signal=carrier, srate=srate,
+                                           freq=4, depth=0.5), n, 0, 0),
+    ]
+    return out
+
+
+def compare(reference, optimized):
+    """
+    Sample and spectral difference of two outputs.
+
+    Returns
+    -------
+    (largest sample difference relative to the reference peak,
+    largest magnitude spectrum difference in dB)
+    """
+    reference = np.asarray(reference, dtype=float)
+    optimized = np.asarray(optimized, dtype=float)
+    if reference.shape != optimized.shape:
+        return np.inf, np.inf
+
+    peak = np.max(np.abs(reference)) or 1.0
+    sample = np.max(np.abs(optimized - reference)) / peak
+
+    spec_r = np.abs(fftbackend.rfft(reference, axis=0))
+    spec_o = np.abs(fftbackend.rfft(optimized, axis=0))
+    # ピークから60dB以内のbinだけ比べる
+    band = spec_r > spec_r.max() * 1e-3
+    tiny = np.finfo(float).tiny
+    spectral = np.max(np.abs(20 * np.log10((spec_o[band] + tiny)
+                                           / (spec_r[band] + tiny)))) \
+        if band.any() else 0.0
+    return float(sample), float(spectral)
+
+
+def _timed(func, seed, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        np.random.seed(seed)
+        start = time.perf_counter()
+        sig = func()
+        best = min(best, time.perf_counter() - start)
+    return sig, best
+
+
+def check(case, repeat=3):
+    """
+    Run one case.
+
+    Returns
+    -------
+    dict with "name", "sample", "spectral_db", "ok", and the throughput
+    "reference_rate" / "optimized_rate" in samples/s and "speedup".
+    """
+    ref, t_ref = _timed(case.reference, case.seed, repeat)
+    opt, t_opt = _timed(case.optimized, case.seed, repeat)
+    if case.measure is not None:
+        ref, opt = case.measure(ref), case.measure(opt)
+    sample, spectral = compare(ref, opt)
+    return {"name": case.name, "sample": sample, "spectral_db": spectral,
+            "ok": sample <= case.sample_tol and spectral <= case.spectral_tol,
+            "reference_rate": case.samples / t_ref,
+            "optimized_rate": case.samples / t_opt,
+            "speedup": t_ref / t_opt}
+
+
+def run(selected=None, repeat=3, **kwargs):
+    """
+    Run the cases.
+
+    Parameters
+    ----------
+    selected : list of Case
+        Cases to run. Default is cases(**kwargs).(optional)
+    repeat : int
+        Timing runs per path, the fastest is used.(optional)
+
+    Returns
+    -------
+    List of check() results.
+    """
+    if selected is None:
+        selected = cases(**kwargs)
+    return [check(case, repeat) for case in selected]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check optimized paths against the reference "
+                    "implementations and compare their throughput.")
+    parser.add_argument("--srate", type=int, default=48000)
+    parser.add_argument("--duration", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("-k", dest="pattern", default="",
+                        help="only cases whose name contains this")
+    args = parser.parse_args(argv)
+
+    selected = [c for c in cases(args.srate, args.duration)
+                if args.pattern in c.name]
+    failed = 0
+    print("%-44s %10s %10s %12s %12s %7s" % ("case", "sample", "dB",
+                                             "ref Ms/s", "opt Ms/s", "x"))
+    for r in run(selected, args.repeat):
+        failed += not r["ok"]
+        print("%-44s %10.2e %10.2e %12.2f %12.2f %7.2f %s"
+              % (r["name"], r["sample"], r["spectral_db"],
+                 r["reference_rate"] / 1e6, r["optimized_rate"] / 1e6,
+                 r["speedup"], "ok" if r["ok"] else "FAIL"))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
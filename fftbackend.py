@@ -0,0 +1,228 @@
+import os
+import functools
+import numpy as np
+
+
+_BACKENDS = ("numpy", "scipy", "pyfftw")
+
+_state = {"name": None, "workers": None}
+
+
+def set_backend(name="auto", workers=None):
+    """
+    Select the FFT backend used by the generators.
+    Requires:
+        numpy
+        scipy (optional)
+        pyfftw (optional)
+
+    Parameters
+    ----------
+    name : str
+        "numpy", "scipy", "pyfftw" or "auto". "auto" picks pyfftw if
+        installed, otherwise scipy, otherwise numpy.
+    workers : int
+        Number of threads for scipy/pyfftw. Default is all cores. scipy
+        uses them only across a batch of transforms (2-D input), pyfftw
+        also within one transform.(optional)
+    """
+    if name == "auto":
+        name = "numpy"
+        for candidate in ("pyfftw", "scipy"):
+            try:
+                __import__(candidate)
+            except ImportError:
+                continue
+            name = candidate
+            break
+    if name not in _BACKENDS:
+        raise ValueError("unknown FFT backend: %s" % name)
+    if name != "numpy":
+        # 存在しなければここでImportError
+        __import__(name)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    _state["name"] = name
+    _state["workers"] = workers
+    _plan.cache_clear()
+
+
+def get_backend():
+    """
+    Return the current backend as (name, workers).
+    """
+    if _state["name"] is None:
+        set_backend()
+    return _state["name"], _state["workers"]
+
+
+@functools.lru_cache(maxsize=None)
+def next_fast_len(n):
+    """
+    Smallest length >= n that factors into 2, 3 and 5 only.
+
+    Parameters
+    ----------
+    n : int
+        Requested transform length.
+
+    Returns
+    -------
+    Fast transform length as int.
+    """
+    n = int(n)
+    if n <= 6:
+        return max(n, 1)
+    best = 2 ** int(np.ceil(np.log2(n)))
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            # 2の冪で n 以上まで埋める
+            m = p35
+            while m < n:
+                m *= 2
+            if m < best:
+                best = m
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+@functools.lru_cache(maxsize=64)
+def _plan(kind, shape, dtype, n, axis, workers):
+    # pyFFTWのplanをshape毎に保持する
+    import pyfftw
+    builder = getattr(pyfftw.builders, kind)
+    template = pyfftw.empty_aligned(shape, dtype=dtype)
+    return builder(template, n=n, axis=axis, threads=workers,
+                   planner_effort="FFTW_MEASURE")
+
+
+def _run(kind, x, n, axis, workers=None, overwrite=False):
+    name, default = get_backend()
+    if workers is None:
+        workers = default
+    if name == "scipy":
+        import scipy.fft
+        return getattr(scipy.fft, kind)(x, n=n, axis=axis, workers=workers,
+                                        overwrite_x=overwrite)
+    if name == "pyfftw":
+        if kind in ("fft", "ifft"):
+            x = np.asarray(x, dtype=complex)
+        elif kind == "rfft":
+            x = np.asarray(x, dtype=float)
+        else:
+            x = np.asarray(x, dtype=complex)
+        plan = _plan(kind, x.shape, x.dtype.str, n, axis, workers)
+        # 出力バッファはplanが再利用するのでコピーして返す
+        return plan(x).copy()
+    if overwrite and n is None and kind in ("fft", "ifft") \
+            and x.dtype == complex:
+        try:
+            return getattr(np.fft, kind)(x, axis=axis, out=x)
+        except TypeError:
+            # numpy 2.0未満はoutがない
+            pass
+    return getattr(np.fft, kind)(x, n=n, axis=axis)
+
+
+def fft(x, n=None, axis=-1, pad=False, workers=None):
+    """
+    Forward complex FFT on the current backend.
+
+    Parameters
+    ----------
+    x : ndarray()
+        Input signal.
+    n : int
+        Transform length.(optional)
+    axis : int
+        Axis to transform.(optional)
+    pad : bool
+        Zero-pad to next_fast_len when n is not given.(optional)
+    workers : int
+        Threads for this call instead of the backend default.(optional)
+
+    Returns
+    -------
+    Spectrum in ndarray().
+    """
+    if n is None and pad:
+        n = next_fast_len(np.shape(x)[axis])
+    return _run("fft", x, n, axis, workers)
+
+
+def ifft(x, n=None, axis=-1, workers=None, overwrite=False):
+    """
+    Inverse complex FFT on the current backend.
+
+    Parameters
+    ----------
+    x : ndarray()
+        Input spectrum.
+    n : int
+        Transform length.(optional)
+    axis : int
+        Axis to transform.(optional)
+    workers : int
+        Threads for this call instead of the backend default.(optional)
+    overwrite : bool
+        Allow the result to be written into x (scipy, numpy >= 2.0), so
+        no second buffer of the size of x is allocated.(optional)
+
+    Returns
+    -------
+    Signal in ndarray().
+    """
+    return _run("ifft", x, n, axis, workers, overwrite)
+
+
+def rfft(x, n=None, axis=-1, pad=False, workers=None):
+    """
+    Forward real FFT on the current backend.
+
+    Parameters
+    ----------
+    x : ndarray()
+        Real input signal.
+    n : int
+        Transform length.(optional)
+    axis : int
+        Axis to transform.(optional)
+    pad : bool
+        Zero-pad to next_fast_len when n is not given.(optional)
+    workers : int
+        Threads for this call instead of the backend default.(optional)
+
+    Returns
+    -------
+    Half spectrum in ndarray().
+    """
+    if n is None and pad:
+        n = next_fast_len(np.shape(x)[axis])
+    return _run("rfft", x, n, axis, workers)
+
+
+def irfft(x, n=None, axis=-1, workers=None):
+    """
+    Inverse real FFT on the current backend.
+
+    Parameters
+    ----------
+    x : ndarray()
+        Half spectrum (DC to Nyquist).
+    n : int
+        Output length. Give it explicitly for odd lengths.(optional)
+    axis : int
+        Axis to transform.(optional)
+    workers : int
+        Threads for this call instead of the backend default.(optional)
+
+    Returns
+    -------
+    Real signal in ndarray().
+    """
+    return _run("irfft", x, n, axis, workers)
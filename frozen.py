@@ -0,0 +1,152 @@
+import numpy as np
+import fftbackend
+import channels
+
+
+# 各generatorの目標ラウドネス
+_LUFS = {"akeroyd": -17, "phasewarp": -14, "pd_shift": -14,
+         "phase_delay": -14}
+
+
+class FrozenNoise:
+    """
+    One in-band noise spectrum from which the right channels of several
+    conditions are derived, so that every condition uses the same noise
+    token.
+    Requires:
+        pyloudnorm
+        numpy
+
+    Parameters
+    ----------
+    srate : int
+        Sampling rate in Hz.
+    duration : int
+        Total duration in seconds.
+    bwd : int
+        Bandwidth in Hz.
+    centre : int
+        Centre frequency of bandpass filter in Hz.
+    magnitude : str
+        "gaussian": complex Gaussian bins as in akeroyd and pd_shift.
+        "unit": unit magnitude with random phase as in phasewarp.
+        (default is gaussian)
+    """
+
+    def __init__(self, srate, duration, bwd, centre, magnitude="gaussian"):
+        self.srate = srate
+        self.duration = duration
+
+        # 周波数をbin数に直す
+        self.nq_bin = int(srate * duration / 2)
+        self.bwd_bin = bwd * duration
+        self.bwdlow_bin = (centre - int(bwd/2)) * duration
+
+        # 通過帯域内の信号生成 (各generatorと同じ乱数の使い方)
+        if magnitude == "gaussian":
+            self.inbwd = np.random.normal(size=self.bwd_bin) + 1j * \
+                np.random.normal(size=self.bwd_bin)
+        elif magnitude == "unit":
+            self.inbwd = np.exp(1j * np.random.normal(0, np.pi, self.bwd_bin))
+        else:
+            raise ValueError("unknown magnitude: %s" % magnitude)
+
+    def _row(self, spec, low, inbwd):
+        if low < 0 or low + self.bwd_bin > self.nq_bin:
+            raise ValueError("shifted band is outside 0-Nyquist")
+        spec[1 + low:1 + low + self.bwd_bin] = inbwd
+
+    def spectrum(self, kind, out=None, **params):
+        """
+        Half spectrum (DC to Nyquist) of one channel.
+
+        Parameters
+        ----------
+        kind : str
+            "left": the unshifted noise.
+            "akeroyd": band moved by shift (shift, init_direction).
+            "phasewarp": bins rotated circularly inside the band by shift
+            (shift, init_direction).
+            "pd_shift": band moved by shift with a phase delay relative to
+            the band edge (shift, init_direction, delay).
+            "phase_delay": phase delay of the noise (delay, move_to).
+        out : ndarray()
+            Zeroed complex buffer of length nq_bin + 1 to fill.(optional)
+        params
+            Parameters of the generator, delay in milliseconds.
+
+        Returns
+        -------
+        Complex ndarray() of length nq_bin + 1.
+        """
+        if out is None:
+            out = np.zeros(self.nq_bin + 1, dtype=complex)
+
+        if kind == "phase_delay":
+            ud = 1 if params["move_to"] == "right" else -1
+        elif kind != "left":
+            ud = 1 if params["init_direction"] == "right" else -1
+        shift_bin = params.get("shift", 0) * self.duration
+        # bin i の周波数は i / duration Hz
+        index = np.arange(self.bwd_bin)
+
+        if kind == "left":
+            self._row(out, self.bwdlow_bin, self.inbwd)
+        elif kind == "akeroyd":
+            self._row(out, self.bwdlow_bin + int(ud * shift_bin), self.inbwd)
+        elif kind == "phasewarp":
+            self._row(out, self.bwdlow_bin,
+                      np.roll(self.inbwd, int(ud * shift_bin)))
+        elif kind == "pd_shift":
+            ramp = np.exp(1j * 2 * np.pi * index / self.duration
+                          * params["delay"] * ud / 1000)
+            self._row(out, self.bwdlow_bin + int(ud * shift_bin),
+                      self.inbwd * ramp)
+        elif kind == "phase_delay":
+            ramp = np.exp(1j * 2 * np.pi * (self.bwdlow_bin + 1 + index)
+                          / self.duration * params["delay"] * ud / 1000)
+            self._row(out, self.bwdlow_bin, self.inbwd * ramp)
+        else:
+            raise ValueError("unknown condition: %s" % kind)
+        return out
+
+    def derive(self, conditions, LUFS=None, parallel=False):
+        """
+        Stereo signals of many conditions from one batched real IFFT.
+
+        Parameters
+        ----------
+        conditions : list of (str, dict)
+            Condition kind and parameters, see spectrum().
+        LUFS : float
+            Loudness of the output in LUFS. Default is the target of each
+            generator.(optional)
+        parallel : bool
+            Normalize the channels concurrently in threads.(optional)
+
+        Returns
+        -------
+        List of ndarray(), shape: (n,2), one per condition. The left channel
+        is the same noise in all of them.
+        """
+        spec = np.zeros((len(conditions) + 1, self.nq_bin + 1), dtype=complex)
+        self.spectrum("left", spec[0])
+        for row, (kind, params) in zip(spec[1:], conditions):
+            self.spectrum(kind, row, **params)
+
+        # IFFT, cast
+        tsig = fftbackend.irfft(spec, n=2 * self.nq_bin, axis=-1) * 100
+        tsig = tsig.astype(np.float32)
+        del spec
+
+        targets = [_LUFS[kind] if LUFS is None else LUFS
+                   for kind, _ in conditions]
+        # Lチャンネルは目標値ごとに1回だけ正規化する
+        out = [None] * len(conditions)
+        for targ in set(targets):
+            rows = [i for i, t in enumerate(targets) if t == targ]
+            sigs = [tsig[0]] + [tsig[1 + i] for i in rows]
+            normed = channels.normalize(sigs, self.srate, targ, parallel)
+            for i, right in zip(rows, normed[1:]):
+                out[i] = np.vstack([normed[0], right]).T
+        return out
@@ -0,0 +1,196 @@
+import dataclasses
+import hashlib
+import json
+import os
+import time
+
+import registry
+
+
+def job_key(job):
+    """
+    Stable identifier of a job (generator, parameters, seed, output).
+
+    Returns
+    -------
+    Hex string.
+    """
+    text = json.dumps([job.name, dataclasses.asdict(job.params), job.seed,
+                       job.file_name, job.format], sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def checksum(file_name, chunk=2**20):
+    """
+    SHA-256 of a file, read in chunks.
+    """
+    h = hashlib.sha256()
+    with open(file_name, "rb") as f:
+        for data in iter(lambda: f.read(chunk), b""):
+            h.update(data)
+    return h.hexdigest()
+
+
+def _part(file_name):
+    # 拡張子は残す (soundfileが形式を判断するため)
+    root, ext = os.path.splitext(file_name)
+    return root + ".part" + ext
+
+
+class Journal:
+    """
+    Append-only JSONL record of completed jobs. Each line holds the job
+    key, generator, parameters, seed, output file and its SHA-256, and is
+    flushed to disk before the next job is recorded, so a run killed at
+    any point loses at most the jobs in flight.
+
+    Parameters
+    ----------
+    path : str
+        Journal file path. Created if missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        tail = ""
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    tail = line
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 書き込み途中で落ちた最後の行
+                        continue
+                    self.records[entry["key"]] = entry
+        self._file = open(path, "a")
+        if tail and not tail.endswith("\n"):
+            self._file.write("\n")
+
+    def record(self, job, digest, elapsed=None):
+        """
+        Append one completed job.
+        """
+        entry = {"key": job_key(job), "generator": job.name,
+                 "params": dataclasses.asdict(job.params), "seed": job.seed,
+                 "file_name": job.file_name, "format": job.format,
+                 "sha256": digest, "elapsed": elapsed, "time": time.time()}
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.records[entry["key"]] = entry
+
+    def done(self, job, verify=True):
+        """
+        Whether a job is recorded and its output file is intact.
+
+        Parameters
+        ----------
+        job : registry.Job
+        verify : bool
+            Compare the checksum of the file, not only its existence.
+            (optional)
+        """
+        entry = self.records.get(job_key(job))
+        if entry is None or not os.path.exists(job.file_name):
+            return False
+        return not verify or checksum(job.file_name) == entry["sha256"]
+
+    def remaining(self, jobs, verify=True):
+        """
+        Jobs that still have to run. Outputs that are missing, partial or
+        do not match their checksum are run again.
+
+        Returns
+        -------
+        List of registry.Job.
+        """
+        todo = []
+        seen = set()
+        for job in jobs:
+            if job.file_name is None:
+                raise ValueError("journaled jobs need a file_name")
+            if job_key(job) in seen:
+                continue
+            seen.add(job_key(job))
+            part = _part(job.file_name)
+            if os.path.exists(part):
+                os.remove(part)
+            if not self.done(job, verify):
+                todo.append(job)
+        return todo
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _run(job):
+    # 一時ファイルに書いてから置き換える (途中のファイルを残さない)
+    start = time.perf_counter()
+    part = _part(job.file_name)
+    registry.run(dataclasses.replace(job, file_name=part))
+    digest = checksum(part)
+    os.replace(part, job.file_name)
+    return digest, time.perf_counter() - start
+
+
+def run_batch(jobs, path, workers=None, verify=True):
+    """
+    Resumable registry.run_batch(). Completed jobs found in the journal
+    are skipped and only the remaining ones are distributed to the
+    workers; every job is recorded as soon as it finishes. A failing job
+    does not stop the others: they are still run and recorded, and the
+    failures are raised together at the end.
+    Requires:
+        numpy
+
+    Parameters
+    ----------
+    jobs : list of registry.Job
+        Jobs with file_name set.
+    path : str
+        Journal file path.
+    workers : int
+        Number of processes. If 1, run in this process.(optional)
+    verify : bool
+        Check the SHA-256 of outputs recorded by an earlier run.(optional)
+
+    Returns
+    -------
+    Number of jobs run in this call. Raises RuntimeError if any job
+    failed.
+    """
+    failed = []
+    with Journal(path) as journal:
+        todo = journal.remaining(jobs, verify)
+        if workers == 1:
+            for job in todo:
+                try:
+                    journal.record(job, *_run(job))
+                except Exception as e:
+                    failed.append((job, e))
+        else:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+
+            with ProcessPoolExecutor(workers) as pool:
+                futures = {pool.submit(_run, job): job for job in todo}
+                for fut in as_completed(futures):
+                    try:
+                        journal.record(futures[fut], *fut.result())
+                    except Exception as e:
+                        failed.append((futures[fut], e))
+
+    if failed:
+        raise RuntimeError("%d of %d jobs failed: %s"
+                           % (len(failed), len(todo),
+                              "; ".join("%s: %r" % (job.file_name, e)
+                                        for job, e in failed))) \
+            from failed[0][1]
+    return len(todo)
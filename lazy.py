@@ -0,0 +1,42 @@
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Heavy dependencies (pyloudnorm, scipy.io, soundfile, matplotlib,
+    librosa) are bound with load() at the top of each module, so importing
+    a generator only costs numpy until a function actually runs.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+
+    def __getattr__(self, attr):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__["_module"] = module
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return "<lazy module '%s'>" % self.__name__
+
+
+def load(name):
+    """
+    Return a lazily imported module.
+
+    Parameters
+    ----------
+    name : str
+        Absolute module name, e.g. "scipy.io.wavfile".
+
+    Returns
+    -------
+    LazyModule
+    """
+    return LazyModule(name)
@@ -1,16 +1,129 @@
 import numpy as np
-import pyloudnorm as pyln
-from scipy.io.wavfile import write
-import math
+import fftbackend
+import modulation
+import lazy
 
+pyln = lazy.load("pyloudnorm")
+wavfile = lazy.load("scipy.io.wavfile")
 
-def generate(srate, fc_i, bwd_i, shft_freq_i, duration):
+
+def PanGains(srate, freq, length, law="cosine", max_ild=20, start=0):
+    """
+    Left/right gains of a periodic ILD pan.
+    Requires:
+        numpy
+
+    Parameters
+    ----------
+    srate : int
+        Sampling rate.
+    freq : float
+        Panning frequency in Hz. The pan starts at the left.
+    length : int
+        Number of samples.
+    law : str
+        "cosine" (raised-cosine amplitude, L + R = 1), "power"
+        (constant-power, L^2 + R^2 = 1) or "db" (ILD linear in dB between
+        +max_ild and -max_ild). (default is cosine)
+    max_ild : float
+        Peak ILD in dB for the "db" law.(optional)
+    start : int
+        Index of the first sample, for block-wise use.(optional)
+
+    Returns
+    -------
+    Gains in ndarray(), shape: (length, 2)
+    """
+    c = modulation._Modulator("cos", srate, freq, length, 0.0, start)
+
+    if law == "cosine":
+        gain_l = (1 + c) / 2
+        gain_r = (1 - c) / 2
+    elif law == "power":
+        pos = (1 - c) * np.pi / 4
+        gain_l = np.cos(pos)
+        gain_r = np.sin(pos)
+    elif law == "db":
+        gain_l = 10 ** (max_ild * c / 40)
+        gain_r = 1 / gain_l
+    else:
+        raise ValueError("unknown pan law: %s" % law)
+
+    return np.stack([gain_l, gain_r], axis=1)
+
+
+def Pan(signal, srate, freq, law="cosine", max_ild=20):
+    """
+    Apply a periodic ILD pan to a signal.
+    Requires:
+        numpy
+
+    Parameters
+    ----------
+    signal : ndarray()
+        shape: (n,) or (n,1) mono, or (n,2) stereo.
+    srate : int
+        Sampling rate.
+    freq : float
+        Panning frequency in Hz.
+    law : str
+        Pan law, see PanGains(). (default is cosine)
+    max_ild : float
+        Peak ILD in dB for the "db" law.(optional)
+
+    Returns
+    -------
+    Output signal in ndarray(), shape: (n,2)
+    """
+    signal = np.asarray(signal)
+    if signal.ndim == 1:
+        signal = signal[:, np.newaxis]
+    gains = PanGains(srate, freq, len(signal), law, max_ild)
+    return (signal * gains).astype(signal.dtype, copy=False)
+
+
+def PanFile(in_file, out_file, freq, law="cosine", max_ild=20, block=65536):
+    """
+    Apply a periodic ILD pan to a wav file block by block.
+    Requires:
+        numpy
+        pysoundfile
+
+    Parameters
+    ----------
+    in_file : str
+        Input wav file path. (mono or stereo)
+    out_file : str
+        Output wav file path. (32-bit float, stereo)
+    freq : float
+        Panning frequency in Hz.
+    law : str
+        Pan law, see PanGains(). (default is cosine)
+    max_ild : float
+        Peak ILD in dB for the "db" law.(optional)
+    block : int
+        Block length in samples.(optional)
+    """
+    import soundfile as sf
+
+    with sf.SoundFile(in_file) as src, \
+            sf.SoundFile(out_file, "w", src.samplerate, 2, "FLOAT") as dst:
+        start = 0
+        for data in src.blocks(blocksize=block, dtype="float32",
+                               always_2d=True):
+            gains = PanGains(src.samplerate, freq, len(data), law, max_ild,
+                             start)
+            dst.write((data * gains).astype(np.float32))
+            start += len(data)
+
+
+def generate(srate, fc_i, bwd_i, shft_freq_i, duration, law="cosine",
+             max_ild=20, file_name="ILD.wav", wav=True):
     """
     Generate a Band Pass Noise signal with ILD panning.
     Requires:
         pyloudnorm
         numpy
-        math
         scipy.io.wavfile.write
 
     Parameters
@@ -25,57 +138,49 @@ def generate(srate, fc_i, bwd_i, shft_freq_i, duration):
         Shifting frequency in Hz.
     duration : int
         Total duration in seconds.
+    law : str
+        Pan law, see PanGains(). (default is cosine)
+    max_ild : float
+        Peak ILD in dB for the "db" law.(optional)
+    file_name : str
+        Output file name.(optional)
+    wav : bool
+        Output wav file or not. If False, return the signal.(optional)
 
     Returns
     -------
     Output signal in 32-bit float wav format at current directory.
     """
-    fs = srate * duration
-    fc = fc_i * duration
+    total_bin = srate * duration
+    nq_bin = int(total_bin / 2)
     bwd = bwd_i * duration
-    shft_freq = shft_freq_i * duration
-
-    fn = fs / 2
+    fdwn = int(fc_i * duration - bwd / 2)
 
     lufs_targ = -14
-    meter = pyln.Meter(fs)
-
-    fdwn = fc - bwd / 2
-    fup = fc + bwd / 2
+    meter = pyln.Meter(srate)
 
-    specwid = np.random.normal(size=bwd) + 1j * np.random.normal(size=bwd)
-    specdwn = np.zeros((1, int(fdwn)), dtype=complex)
-    specup = np.zeros((1, int(fn - fup)), dtype=complex)
+    # 片側スペクトルから帯域雑音を生成
+    spec = np.zeros(nq_bin + 1, dtype=complex)
+    spec[fdwn:fdwn + bwd] = np.random.normal(size=bwd) + 1j * \
+        np.random.normal(size=bwd)
+    sig_base = fftbackend.irfft(spec, n=2 * nq_bin)
 
-    spec = np.block([specdwn, specwid, specup])
-    specCo = spec.conjugate()
-    specCon = np.flipud(specCo)
-
-    spec_base = np.block([spec, specCon])
-    sig_base = np.imag(np.fft.ifft(spec_base))
-
-    # make cos curve
-    ln = 2 * math.pi * shft_freq / fs  # 1sampleの位相の大きさ
-
-    index = np.arange(0, 2 * math.pi * shft_freq - ln/2, ln, dtype=float)
-    sh_index = np.arange(math.pi,  math.pi+2 * math.pi * shft_freq - ln/2, ln)
-
-    cos_sig_l = [(math.cos(i)+1)/2 for i in index]
-    cos_sig_r = [(math.cos(i)+1)/2 for i in sh_index]
-
-    sig_l = sig_base * cos_sig_l * 10
-    sig_r = sig_base * cos_sig_r * 10
+    # panning
+    sig = Pan(sig_base, srate, shft_freq_i, law, max_ild) * 10
 
     # cast to 32bit float
-    sig_l = sig_l.astype(np.float32)
-    sig_r = sig_r.astype(np.float32)
+    sig = sig.astype(np.float32)
 
     # normalize
-    lufs_sorc_l = meter.integrated_loudness(sig_l.T)
-    lufs_sorc_r = meter.integrated_loudness(sig_r.T)
+    lufs_sorc_l = meter.integrated_loudness(sig[:, 0])
+    lufs_sorc_r = meter.integrated_loudness(sig[:, 1])
+
+    sig_l_n = pyln.normalize.loudness(sig[:, 0], lufs_sorc_l, lufs_targ)
+    sig_r_n = pyln.normalize.loudness(sig[:, 1], lufs_sorc_r, lufs_targ)
 
-    sig_l_n = pyln.normalize.loudness(sig_l, lufs_sorc_l, lufs_targ)
-    sig_r_n = pyln.normalize.loudness(sig_r, lufs_sorc_r, lufs_targ)
+    sig = np.vstack([sig_l_n, sig_r_n]).T
 
-    sig = np.block([sig_l_n.T, sig_r_n.T])
-    write('ILD.wav', int(fs / duration), sig)
+    if wav:
+        wavfile.write(file_name, srate, sig)
+    else:
+        return sig
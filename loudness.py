@@ -0,0 +1,103 @@
+import functools
+
+import numpy as np
+import lazy
+
+pyln = lazy.load("pyloudnorm")
+
+
+@functools.lru_cache(maxsize=None)
+def k_weighting(srate, freq):
+    """
+    Power gain of the K-weighting filter of pyloudnorm at one frequency.
+    Cached per (srate, freq).
+    Requires:
+        pyloudnorm
+        scipy
+
+    Parameters
+    ----------
+    srate : int
+        Sampling rate in Hz.
+    freq : float
+        Frequency in Hz.
+
+    Returns
+    -------
+    |H(freq)|^2 as float.
+    """
+    from scipy.signal import freqz
+
+    gain = 1.0
+    # Meterと同じ係数を使う
+    for stage in pyln.Meter(srate)._filters.values():
+        _, h = freqz(stage.b, stage.a, worN=[freq], fs=srate)
+        gain *= (stage.passband_gain * abs(h[0])) ** 2
+    return gain
+
+
+def tone_loudness(srate, freqs, amps=1.0):
+    """
+    Integrated loudness of a steady tone or multi-tone signal, computed
+    from the K-weighted power of its components instead of the gated
+    meter.
+
+    Parameters
+    ----------
+    srate : int
+        Sampling rate in Hz.
+    freqs : float or list of float
+        Frequencies of the components in Hz (all different).
+    amps : float or list of float
+        Peak amplitudes of the components.(optional)
+
+    Returns
+    -------
+    Loudness in LUFS.
+    """
+    freqs, amps = np.broadcast_arrays(np.atleast_1d(freqs),
+                                      np.atleast_1d(amps))
+    power = sum(a ** 2 / 2 * k_weighting(srate, float(f))
+                for f, a in zip(freqs, amps))
+    return -0.691 + 10 * np.log10(power)
+
+
+def normalize_tone(signal, srate, freqs, lufs_targ, amps=1.0, verify=False,
+                   tol=0.1):
+    """
+    Normalize a tone signal to the target loudness without the meter.
+    Requires:
+        pyloudnorm (verify only)
+        numpy
+        scipy
+
+    Parameters
+    ----------
+    signal : ndarray()
+        The tone signal.
+    srate : int
+        Sampling rate in Hz.
+    freqs : float or list of float
+        Frequencies of the components in Hz.
+    lufs_targ : float
+        Target loudness in LUFS.
+    amps : float or list of float
+        Peak amplitudes of the components in signal.(optional)
+    verify : bool
+        Also measure the result with pyloudnorm and raise ValueError if it
+        deviates by more than tol.(optional)
+    tol : float
+        Tolerance of verify in LU.(optional)
+
+    Returns
+    -------
+    Normalized signal in ndarray().
+    """
+    gain = 10 ** ((lufs_targ - tone_loudness(srate, freqs, amps)) / 20)
+    out = signal * gain
+    if verify:
+        measured = pyln.Meter(srate).integrated_loudness(out)
+        if abs(measured - lufs_targ) > tol:
+            raise ValueError("analytic loudness is off by %.3f LU"
+                             % (measured - lufs_targ))
+    return out
@@ -0,0 +1,266 @@
+import dataclasses
+import os
+
+import numpy as np
+import registry
+import frozen
+import akeroyd
+import pcm
+
+
+# 1サンプル (srate * duration) あたりのピークbyte数
+# (calibrate()で計測, 出力配列を含む. tests/test_memplan.pyで確認)
+_PER_SAMPLE = {
+    ("akeroyd", "full"): 112,
+    ("akeroyd", "rfft"): 56,
+    ("akeroyd", "analytic"): 40,
+    ("akeroyd", "crop"): 160,
+    ("pd_shift", "full"): 96,
+    ("pd_shift", "rfft"): 56,
+    ("phasewarp", "full"): 96,
+    ("phasewarp", "rfft"): 56,
+    ("phase_delay", "full"): 88,
+    ("noise", "full"): 96,
+    ("bandpass", "full"): 112,
+    ("binaural_beat", "full"): 48,
+    ("level", "full"): 64,
+}
+
+# oscarは帯域数に比例
+_OSCAR_BASE = 64
+_OSCAR_PER_BAND = 32
+
+# モジュール, 一時配列などの固定分
+_OVERHEAD = 16 * 2**20
+
+
+def strategies(name, params):
+    """
+    Strategies available for a generator, in order of preference.
+
+    "full" is the generator itself. "rfft" synthesizes the same signal
+    from half spectra (frozen.FrozenNoise, identical output). "analytic"
+    and "crop" are the methods of akeroyd.GenerateInitIpd().
+
+    Returns
+    -------
+    List of str.
+    """
+    if name == "akeroyd" and params.init_ipd is not None:
+        return ["analytic", "crop"]
+    if name in ("akeroyd", "pd_shift", "phasewarp"):
+        return ["full", "rfft"]
+    return ["full"]
+
+
+def estimate(name, params, strategy="full"):
+    """
+    Predict the peak memory of one generator call.
+
+    Parameters
+    ----------
+    name : str
+        Registry name of the generator.
+    params : dataclass
+        Its parameter object, see registry.params_of().
+    strategy : str
+        See strategies(). (default is full)
+
+    Returns
+    -------
+    Peak bytes as int.
+    """
+    samples = params.srate * params.duration
+    if name == "oscar":
+        per_sample = _OSCAR_BASE + _OSCAR_PER_BAND * len(params.fcs)
+    else:
+        key = (name, strategy)
+        if key not in _PER_SAMPLE:
+            raise ValueError("no estimate for %s with %s" % (name, strategy))
+        per_sample = _PER_SAMPLE[key]
+    return int(per_sample * samples) + _OVERHEAD
+
+
+def plan(job, budget):
+    """
+    Choose the first strategy of a job that fits into the budget.
+
+    Parameters
+    ----------
+    job : registry.Job
+    budget : int
+        Memory budget in bytes.
+
+    Returns
+    -------
+    (strategy, estimated peak bytes). Raises MemoryError if none fits.
+    """
+    best = None
+    for strategy in strategies(job.name, job.params):
+        peak = estimate(job.name, job.params, strategy)
+        if peak <= budget:
+            return strategy, peak
+        if best is None or peak < best:
+            best = peak
+    raise MemoryError("%s needs at least %.1f MiB, budget is %.1f MiB"
+                      % (job.name, best / 2**20, budget / 2**20))
+
+
+def _rfft(job):
+    p = job.params
+    cond = {"shift": p.shift, "init_direction": p.init_direction}
+    magnitude = "gaussian"
+    lufs = None
+    if job.name == "akeroyd":
+        lufs = p.LUFS
+    elif job.name == "pd_shift":
+        cond["delay"] = p.delay
+    elif job.name == "phasewarp":
+        magnitude = "unit"
+    noise = frozen.FrozenNoise(p.srate, p.duration, p.bwd, p.centre,
+                               magnitude)
+    return noise.derive([(job.name, cond)], LUFS=lufs)[0]
+
+
+def run(job, budget=None, strategy=None):
+    """
+    registry.run() with the strategy chosen by plan().
+
+    Parameters
+    ----------
+    job : registry.Job
+    budget : int
+        Memory budget in bytes. None uses the first strategy.(optional)
+    strategy : str
+        Force a strategy instead of planning.(optional)
+
+    Returns
+    -------
+    Output signal in ndarray(), or the file name if job.file_name is set.
+    """
+    if strategy is None:
+        if budget is None:
+            strategy = strategies(job.name, job.params)[0]
+        else:
+            strategy, _ = plan(job, budget)
+
+    if strategy in ("full", "analytic"):
+        return registry.run(job)
+
+    if job.seed is not None:
+        np.random.seed(job.seed)
+    if strategy == "rfft":
+        sig = _rfft(job)
+    elif strategy == "crop":
+        kwargs = {key: value for key, value
+                  in dataclasses.asdict(job.params).items()
+                  if value is not None}
+        sig = akeroyd.GenerateInitIpd(method="crop", **kwargs)
+    else:
+        raise ValueError("unknown strategy: %s" % strategy)
+
+    if job.file_name is None:
+        return sig
+    pcm.write(job.file_name, job.params.srate, sig, job.format)
+    return job.file_name
+
+
+def pack(jobs, budget, workers):
+    """
+    Group jobs into rounds that run concurrently within the budget
+    (first-fit decreasing on the planned peaks).
+
+    Parameters
+    ----------
+    jobs : list of registry.Job
+    budget : int
+        Memory budget in bytes shared by all workers.
+    workers : int
+        Number of jobs running at once.
+
+    Returns
+    -------
+    List of rounds, each a list of (job index, strategy, peak bytes).
+    """
+    planned = []
+    for i, job in enumerate(jobs):
+        strategy, peak = plan(job, budget)
+        planned.append((i, strategy, peak))
+
+    rounds = []
+    for item in sorted(planned, key=lambda x: -x[2]):
+        for r in rounds:
+            if len(r) < workers and sum(x[2] for x in r) + item[2] <= budget:
+                r.append(item)
+                break
+        else:
+            rounds.append([item])
+    return rounds
+
+
+def _run_planned(args):
+    job, strategy = args
+    return run(job, strategy=strategy)
+
+
+def run_batch(jobs, budget, workers=None):
+    """
+    registry.run_batch() that keeps the summed peak memory of the running
+    jobs within the budget.
+
+    Parameters
+    ----------
+    jobs : list of registry.Job
+    budget : int
+        Memory budget in bytes for all workers together.
+    workers : int
+        Number of processes.(optional)
+
+    Returns
+    -------
+    List of run() results in job order.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(workers) as pool:
+        for r in pack(jobs, budget, workers):
+            args = [(jobs[i], strategy) for i, strategy, _ in r]
+            for (i, _, _), out in zip(r, pool.map(_run_planned, args)):
+                results[i] = out
+    return results
+
+
+def calibrate(job, strategy="full", warmup=True):
+    """
+    Measure the peak memory of a job with tracemalloc, e.g. to check
+    estimate() for a new generator or backend.
+
+    Parameters
+    ----------
+    job : registry.Job
+    strategy : str
+        See strategies(). (default is full)
+    warmup : bool
+        Run a 1 second version of the job first, so that lazy imports and
+        caches are not counted.(optional)
+
+    Returns
+    -------
+    (measured peak bytes, peak bytes per sample)
+    """
+    import tracemalloc
+
+    job = dataclasses.replace(job, file_name=None)
+    if warmup:
+        run(dataclasses.replace(
+            job, params=dataclasses.replace(job.params, duration=1)),
+            strategy=strategy)
+    tracemalloc.start()
+    try:
+        run(job, strategy=strategy)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak, peak / (job.params.srate * job.params.duration)
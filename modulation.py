@@ -1,5 +1,64 @@
+from collections import OrderedDict
 import numpy as np
-import soundfile as sf
+import lazy
+
+sf = lazy.load("soundfile")
+
+
+# 全長の変調波はbyte数で上限を決めて保持する
+_cache = OrderedDict()
+_CACHE_BYTES = 64 * 2**20
+
+
+def _Modulator(kind, srate, freq, length, phase=0.0, start=0):
+    """
+    Modulator waveform shared by the modulation and panning functions.
+    Whole waveforms (start 0) are cached up to _CACHE_BYTES in total;
+    blocks (start > 0) and waveforms larger than that are not cached.
+
+    Parameters
+    ----------
+    kind : str
+        "sin", "halfsin" or "cos".
+    srate : int
+        sampling rate in Hz.
+    freq : float
+        modulation frequency in Hz.
+    length : int
+        number of samples.
+    phase : float
+        initial phase in radians.
+    start : int
+        index of the first sample, for block-wise use.
+
+    Returns
+    -------
+    Read-only ndarray().
+    """
+    key = (kind, srate, freq, length, phase)
+    if start == 0 and key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    index = np.arange(start, start + length)
+    arg = 2 * np.pi * (freq / srate) * index + phase
+    if kind == "sin":
+        mod = np.sin(arg)
+    elif kind == "cos":
+        mod = np.cos(arg)
+    elif kind == "halfsin":
+        # 偶数回目の回転のみ正弦波, それ以外は-1
+        even = (index // (1 / (freq / srate))) % 2 == 0
+        mod = np.where(even, np.sin(arg), -1.0)
+    else:
+        raise ValueError("unknown modulator: %s" % kind)
+    mod.flags.writeable = False
+
+    if start == 0 and mod.nbytes <= _CACHE_BYTES:
+        _cache[key] = mod
+        while sum(m.nbytes for m in _cache.values()) > _CACHE_BYTES:
+            _cache.popitem(last=False)
+    return mod
 
 
 def SinMod(**kwargs):
@@ -31,12 +90,8 @@ def SinMod(**kwargs):
     beta = kwargs["depth"] * alpha
 
     # 正弦波生成
-    phi = kwargs["freq"] / kwargs["srate"]
-    index = np.array(range(kwargs["srate"]*duration))
-    sin_sig = np.zeros(len(index))
-
-    for i in range(len(index)):
-        sin_sig[i] = np.sin(2 * np.pi * phi * index[i] + (3/2)*np.pi)
+    sin_sig = _Modulator("sin", kwargs["srate"], kwargs["freq"],
+                         kwargs["srate"]*duration, (3/2)*np.pi)
 
     # 正規化、最大値が1になる様に
     mod = (alpha + (beta * sin_sig)) / (1 + kwargs["depth"])
@@ -207,16 +262,8 @@ def HalfSinMod(**kwargs):
     beta = kwargs["depth"] * alpha
 
     # 正弦波生成
-    phi = kwargs["freq"] / kwargs["srate"]
-    index = np.array(range(kwargs["srate"]*duration))
-    sin_sig = np.zeros(len(index))
-
-    for i in range(len(index)):
-        # 偶数回目の回転なら
-        if (index[i] // (1 / phi)) % 2 == 0:
-            sin_sig[i] = np.sin(2 * np.pi * phi * index[i] + ((3/2)*np.pi))
-        else:
-            sin_sig[i] = -1
+    sin_sig = _Modulator("halfsin", kwargs["srate"], kwargs["freq"],
+                         kwargs["srate"]*duration, (3/2)*np.pi)
 
     # 正規化、最大値が1になる様に
     mod = (alpha + (beta * sin_sig)) / (1 + kwargs["depth"])
@@ -1,7 +1,11 @@
 import numpy as np
+import fftbackend
+import modulation
 import math
-import pyloudnorm as pyln
-from scipy.io.wavfile import write
+import lazy
+
+pyln = lazy.load("pyloudnorm")
+wavfile = lazy.load("scipy.io.wavfile")
 
 
 def makeBPN(srate, bwd, fcenter, duration):
@@ -43,65 +47,77 @@ def makeBPN(srate, bwd, fcenter, duration):
     specCo = np.flipud(specCon)
 
     spec_BPN = np.block([spec, specCo])
-    return np.imag(np.fft.ifft(spec_BPN))
+    return np.imag(fftbackend.ifft(spec_BPN))
 
 
-def generate(srate, fcs, bwds, shifts, duration):
+def generate(srate, fcs, bwds, shifts, duration, file_name="oscar.wav",
+             wav=True):
     """
     Generate a Oscor singal.
+    Several bands can be given as lists, all band pass noises are
+    synthesized from one half-spectrum buffer with a single batched real
+    IFFT and summed.
 
     Requires:
         pyloudnorm
         numpy
-        math
         scipy.io.wavfile.write
 
     Parameters
     ----------
     srate : int
         Sampling rate.
-    fcs : int
+    fcs : int or list
         Centre frequency of bandpass filter in Hz.
-    bwds : int
+    bwds : int or list
         Bandwidth in Hz.
-    shifts : int
+    shifts : int or list
         Shifting frequency in Hz.
     duration : int
         Total duration in seconds.
+    file_name : str
+        Output file name.(optional)
+    wav : bool
+        Output wav file or not. If False, return the signal.(optional)
 
     Returns
     -------
     Output signal in 32-bit float wav format at current directory.
     """
-    # fs = srate  # sampring rate
-    # fc  # center frequency
-    # bwd  # bandwidth
-    # shift  # shift frequency
-    # duration
-    fs = srate * duration
-    shft_freq = shifts * duration
+    fcs, bwds, shifts = np.broadcast_arrays(fcs, bwds, shifts)
+    fcs = fcs.ravel()
+    bwds = bwds.ravel()
+    shifts = shifts.ravel()
 
     lufs_targ = -14
-    meter = pyln.Meter(fs)
+    meter = pyln.Meter(srate)
 
-    sig_BPN = makeBPN(srate, bwds, fcs, duration)
-    sig_BPN2 = makeBPN(srate, bwds, fcs, duration)
+    # 周波数をbin数に直す
+    total_bin = srate * duration
+    nq_bin = int(total_bin / 2)
 
-    # make pure tone
-    ln = 2 * math.pi * shft_freq / fs  # 1サンプルの位相の大きさ
-    index = np.arange(0, 2 * math.pi * shft_freq - ln / 2, ln,
-                      dtype=float)  # 0から信号長分の位相, lnが割り切れない時サンプル長が狂うのでln/2を引く
-    shft_index = np.arange((math.pi / 2),
-                           2 * math.pi * shft_freq + (math.pi / 2) - ln / 2,
-                           ln,
-                           dtype=float)
+    # 各帯域の雑音 (0: 基準, 1: shift用) を片側スペクトルに並べる
+    spec = np.zeros((2, len(fcs), nq_bin + 1), dtype=complex)
+    for b in range(len(fcs)):
+        width = int(bwds[b] * duration)
+        fdwn = int(fcs[b] * duration - width / 2)
+        spec[:, b, fdwn:fdwn + width] = \
+            np.random.normal(size=(2, width)) + \
+            1j * np.random.normal(size=(2, width))
 
-    sin_sig = np.array([math.sin(i) for i in index])
-    shft_sin_sig = np.array([math.sin(i) for i in shft_index])
+    # IFFT
+    sig_BPN = fftbackend.irfft(spec, n=2 * nq_bin, axis=-1)
 
     # modulation
-    sig_l = sig_BPN * sin_sig * 2
-    shift_sig = sig_BPN2 * shft_sin_sig * 2
+    sig_l = np.zeros(2 * nq_bin)
+    shift_sig = np.zeros(2 * nq_bin)
+    for b in range(len(fcs)):
+        sin_sig = modulation._Modulator("sin", srate, float(shifts[b]),
+                                        2 * nq_bin, 0.0)
+        shft_sin_sig = modulation._Modulator("sin", srate, float(shifts[b]),
+                                             2 * nq_bin, math.pi / 2)
+        sig_l += sig_BPN[0, b] * sin_sig * 2
+        shift_sig += sig_BPN[1, b] * shft_sin_sig * 2
     sig_r = (sig_l + shift_sig)
 
     # cast to 32bit float
@@ -109,12 +125,15 @@ def generate(srate, fcs, bwds, shifts, duration):
     sig_r = sig_r.astype(np.float32)
 
     # normalize
-    lufs_sorc_l = meter.integrated_loudness(sig_l.T)
-    lufs_sorc_r = meter.integrated_loudness(sig_r.T)
+    lufs_sorc_l = meter.integrated_loudness(sig_l)
+    lufs_sorc_r = meter.integrated_loudness(sig_r)
 
     sig_l_n = pyln.normalize.loudness(sig_l, lufs_sorc_l, lufs_targ)
     sig_r_n = pyln.normalize.loudness(sig_r, lufs_sorc_r, lufs_targ)
 
-    sig = np.block([sig_l_n.T, sig_r_n.T])
+    sig = np.vstack([sig_l_n, sig_r_n]).T
 
-    write('oscar.wav', int(fs / duration), sig)
+    if wav:
+        wavfile.write(file_name, srate, sig)
+    else:
+        return sig
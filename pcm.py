@@ -0,0 +1,183 @@
+import numpy as np
+import lazy
+
+sf = lazy.load("soundfile")
+wavfile = lazy.load("scipy.io.wavfile")
+
+
+# format名: (bit数, soundfileのsubtype)
+FORMATS = {"float32": (None, "FLOAT"),
+           "pcm16": (16, "PCM_16"),
+           "pcm24": (24, "PCM_24")}
+
+
+class ClipStats:
+    """
+    Clipping statistics of quantized output.
+
+    Attributes
+    ----------
+    samples : int
+        Number of samples quantized.
+    clipped : int
+        Number of samples clipped to full scale.
+    peak : float
+        Largest absolute input value (1.0 is full scale).
+    """
+
+    def __init__(self):
+        self.samples = 0
+        self.clipped = 0
+        self.peak = 0.0
+
+    @property
+    def ratio(self):
+        return self.clipped / self.samples if self.samples else 0.0
+
+    def __repr__(self):
+        return "ClipStats(samples=%d, clipped=%d, peak=%.4f)" % (
+            self.samples, self.clipped, self.peak)
+
+
+def quantize(signal, bits, dither=True, rng=None, stats=None):
+    """
+    Quantize a float signal (full scale +-1.0) to integer PCM.
+    Requires:
+        numpy
+
+    Parameters
+    ----------
+    signal : ndarray()
+        Float input signal.
+    bits : int
+        16 or 24.
+    dither : bool
+        Add TPDF dither of +-1 LSB before rounding.(optional)
+    rng : numpy.random.Generator
+        Random generator for the dither.(optional)
+    stats : ClipStats
+        Statistics updated in place.(optional)
+
+    Returns
+    -------
+    int16 ndarray() for 16 bits, int32 ndarray() holding 24-bit values for
+    24 bits.
+    """
+    if bits not in (16, 24):
+        raise ValueError("bits must be 16 or 24")
+    # 24bitはfloat32の仮数部に収まらないのでfloat64で計算
+    dtype = np.float32 if bits == 16 else np.float64
+    scale = 2 ** (bits - 1)
+
+    x = np.multiply(signal, scale, dtype=dtype)
+    if dither:
+        if rng is None:
+            rng = np.random.default_rng()
+        x += rng.random(x.shape, dtype=dtype)
+        x -= rng.random(x.shape, dtype=dtype)
+    np.rint(x, out=x)
+
+    if stats is not None:
+        stats.samples += x.size
+        stats.clipped += int(np.count_nonzero((x < -scale) | (x > scale - 1)))
+        if x.size:
+            stats.peak = max(stats.peak, float(np.max(np.abs(signal))))
+    np.clip(x, -scale, scale - 1, out=x)
+
+    return x.astype(np.int16 if bits == 16 else np.int32)
+
+
+def write(file_name, srate, signal, format="float32", dither=True, rng=None):
+    """
+    Write a signal in the given sample format.
+    Requires:
+        numpy
+        scipy (float32)
+        pysoundfile (pcm16, pcm24)
+
+    Parameters
+    ----------
+    file_name : str
+        Output file name.
+    srate : int
+        Sampling rate.
+    signal : ndarray()
+        shape: (n,) or (n,channels), full scale +-1.0.
+    format : str
+        "float32", "pcm16" or "pcm24". (default is float32)
+    dither : bool
+        TPDF dither for PCM formats.(optional)
+    rng : numpy.random.Generator
+        Random generator for the dither.(optional)
+
+    Returns
+    -------
+    ClipStats (empty for float32).
+    """
+    stats = ClipStats()
+    if format == "float32":
+        wavfile.write(file_name, srate, np.asarray(signal, dtype=np.float32))
+        return stats
+    channels = 1 if np.ndim(signal) == 1 else np.shape(signal)[1]
+    with Writer(file_name, srate, channels, format, dither, rng) as w:
+        w.write(signal)
+    return w.stats
+
+
+class Writer:
+    """
+    Streaming wav writer with dithered PCM conversion per block.
+    Requires:
+        numpy
+        pysoundfile
+
+    Parameters
+    ----------
+    file_name : str
+        Output file name.
+    srate : int
+        Sampling rate.
+    channels : int
+        Number of channels.
+    format : str
+        "float32", "pcm16" or "pcm24". (default is pcm16)
+    dither : bool
+        TPDF dither for PCM formats.(optional)
+    rng : numpy.random.Generator
+        Random generator for the dither.(optional)
+    """
+
+    def __init__(self, file_name, srate, channels, format="pcm16",
+                 dither=True, rng=None):
+        if format not in FORMATS:
+            raise ValueError("unknown format: %s" % format)
+        self.bits, subtype = FORMATS[format]
+        self.dither = dither
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.stats = ClipStats()
+        self.frames = 0
+        self._file = sf.SoundFile(file_name, "w", srate, channels, subtype)
+
+    def write(self, block):
+        """
+        Write a block, shape: (n,) or (n,channels).
+        """
+        if self.bits is None:
+            data = np.asarray(block, dtype=np.float32)
+        else:
+            data = quantize(block, self.bits, self.dither, self.rng,
+                            self.stats)
+            if self.bits == 24:
+                # soundfileはint32を32bit full scaleとして扱う
+                data = data << 8
+        self._file.write(data)
+        self.frames += len(data)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,9 +1,14 @@
 import numpy as np
-import pyloudnorm as pyln
-from scipy.io.wavfile import write
+import fftbackend
+import channels
+import lazy
 
+pyln = lazy.load("pyloudnorm")
+wavfile = lazy.load("scipy.io.wavfile")
 
-def generate(srate: int, delay: int, duration: int, move_to: str):
+
+def generate(srate: int, delay: int, duration: int, move_to: str,
+             file_name: str = "phase_delay.wav", wav: bool = True):
     """
     Generate a Phase-delayed signal.
 
@@ -17,6 +22,10 @@ def generate(srate: int, delay: int, duration: int, move_to: str):
         Total duration in seconds.
     move_to : str
         Direction of move. Either "left" or "right".
+    file_name : str
+        Output file name.(optional)
+    wav : bool
+        Output wav file or not. If False, return the signal.(optional)
 
     Returns
     -------
@@ -48,14 +57,12 @@ def generate(srate: int, delay: int, duration: int, move_to: str):
             np.exp(1j * 2 * np.pi * b2f(i) * delay * ud / 1000)
 
     # 複素共役
-    fsig_right = np.conj(np.flipud(fsig[1:nq_bin]))
-    fsig_sum = np.hstack([fsig, fsig_right])
-    fshift_right = np.conj(np.flipud(fshift[1:nq_bin]))
-    fshift_sum = np.hstack([fshift, fshift_right])
+    spec = np.empty((2, len(fsig) + nq_bin - 1), dtype=complex)
+    channels.hermitian(spec[0], fsig, nq_bin)
+    channels.hermitian(spec[1], fshift, nq_bin)
 
     # IFFT
-    tsig = np.real(np.fft.ifft(fsig_sum))*100
-    tshift = np.real(np.fft.ifft(fshift_sum))*100
+    tsig, tshift = np.real(fftbackend.ifft(spec, overwrite=True))*100
 
     # cast to 32bit float
     tsig = tsig.astype(np.float32)
@@ -69,4 +76,7 @@ def generate(srate: int, delay: int, duration: int, move_to: str):
 
     sig = np.vstack([tsig_n, tshift_n])
 
-    write('phase_delay.wav', srate, sig.T)
+    if wav:
+        wavfile.write(file_name, srate, sig.T)
+    else:
+        return sig.T
@@ -1,10 +1,14 @@
 import numpy as np
+import channels
 import math
-import pyloudnorm as pyln
-from scipy.io.wavfile import write
+import lazy
 
+wavfile = lazy.load("scipy.io.wavfile")
 
-def generate(srate: int, shift: int, duration: int, bwd: int, centre: int, init_direction: str):
+
+def generate(srate: int, shift: int, duration: int, bwd: int, centre: int, init_direction: str,
+             file_name: str = "phasewarp.wav", wav: bool = True,
+             parallel: bool = False):
     """
     Generate a Phasewarp signal.
 
@@ -22,6 +26,13 @@ def generate(srate: int, shift: int, duration: int, bwd: int, centre: int, init_
         Centre frequency of bandpass filter in Hz.
     init_direction : str
         Initial direction of shift. Either "left" or "right".
+    file_name : str
+        Output file name.(optional)
+    wav : bool
+        Output wav file or not. If False, return the signal.(optional)
+    parallel : bool
+        Synthesize and normalize the two channels concurrently in
+        threads. The output is the same.(optional)
 
     Returns
     -------
@@ -33,7 +44,6 @@ def generate(srate: int, shift: int, duration: int, bwd: int, centre: int, init_
         ud = 1
 
     lufs_targ = -14
-    meter = pyln.Meter(srate)
 
     # 周波数をbin数に直す
     total_bin = srate * duration
@@ -61,8 +71,8 @@ def generate(srate: int, shift: int, duration: int, bwd: int, centre: int, init_
     fsig_left = np.hstack([dc, btm_zero, fsig_inbwd, top_zero])
 
     # 複素共役
-    fsig_right = np.conj(np.flipud(fsig_left[1:nq_bin]))
-    fsig = np.hstack([fsig_left, fsig_right])
+    spec = np.empty((2, 2 * nq_bin), dtype=complex)
+    channels.hermitian(spec[0], fsig_left, nq_bin)
 
     # make shifted signal
     if ud == 1:
@@ -79,24 +89,18 @@ def generate(srate: int, shift: int, duration: int, bwd: int, centre: int, init_
     fshift_left = np.hstack([dc, btm_zero, fshift_inbwd, top_zero])
 
     # 複素共役
-    fshift_right = np.conj(np.flipud(fshift_left[1:nq_bin]))
-    fshift = np.hstack([fshift_left, fshift_right])
-
-    # IFFT
-    tsig = np.real(np.fft.ifft(fsig))*100
-    tshift = np.real(np.fft.ifft(fshift))*100
+    channels.hermitian(spec[1], fshift_left, nq_bin)
 
-    # cast to 32-bit float
-    tsig = tsig.astype(np.float32)
-    tshift = tshift.astype(np.float32)
+    # IFFT, cast to 32-bit float
+    tsig, tshift = channels.synthesize(spec, parallel)
 
     # normalize
-    lufs_sorc_l = meter.integrated_loudness(tsig)
-    lufs_sorc_r = meter.integrated_loudness(tshift)
-
-    tsig_n = pyln.normalize.loudness(tsig, lufs_sorc_l, lufs_targ)
-    tshift_n = pyln.normalize.loudness(tshift, lufs_sorc_r, lufs_targ)
+    tsig_n, tshift_n = channels.normalize([tsig, tshift], srate, lufs_targ,
+                                          parallel)
 
     sig = np.vstack([tsig_n, tshift_n])
 
-    write('phasewarp.wav', srate, sig.T)
+    if wav:
+        wavfile.write(file_name, srate, sig.T)
+    else:
+        return sig.T
@@ -0,0 +1,203 @@
+import threading
+import time
+
+import registry
+
+
+class RingBuffer:
+    """
+    Bounded store of generated stimuli with byte-based eviction.
+    Keys are trial indices; when max_bytes is exceeded trials before the
+    current one are evicted first, then the trial furthest in the future,
+    so the next trials stay ready.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Memory budget in bytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.evictions = 0
+        self._items = {}
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, key, sig, current=0):
+        if key in self._items:
+            self.pop(key)
+        self._items[key] = sig
+        self.nbytes += sig.nbytes
+        # 過ぎた試行, 次に一番先の試行から追い出す (次の試行は最後まで残す)
+        while self.nbytes > self.max_bytes and len(self._items) > 1:
+            past = [k for k in self._items if k < current]
+            self.pop(min(past) if past else max(self._items))
+            self.evictions += 1
+
+    def pop(self, key):
+        sig = self._items.pop(key)
+        self.nbytes -= sig.nbytes
+        return sig
+
+
+class Prefetcher:
+    """
+    Generate the next trials of a session in background workers.
+
+    Parameters
+    ----------
+    trials : list of registry.Job
+        Trial order of the session. Jobs must not set file_name.
+    depth : int
+        Number of upcoming trials generated ahead (K).
+    max_bytes : int
+        Memory budget of the ring buffer in bytes.
+    workers : int
+        Number of worker processes.(optional)
+    executor : concurrent.futures.Executor
+        Executor to use instead of a new process pool. Must run jobs in
+        separate processes: registry.run() seeds the global np.random
+        state, so threads would mix the noise of concurrent seeded jobs.
+        A ThreadPoolExecutor raises ValueError.(optional)
+    """
+
+    def __init__(self, trials, depth=4, max_bytes=512 * 2**20, workers=None,
+                 executor=None):
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        if executor is None:
+            executor = ProcessPoolExecutor(workers)
+            self._own_executor = True
+        elif isinstance(executor, ThreadPoolExecutor):
+            raise ValueError("Prefetcher needs a process executor "
+                             "(registry.run seeds the global RNG)")
+        else:
+            self._own_executor = False
+        self.trials = list(trials)
+        self.depth = depth
+        self._executor = executor
+        self._buffer = RingBuffer(max_bytes)
+        self._futures = {}
+        self._served = set()
+        self._current = 0
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "late": 0, "misses": 0,
+                         "wait_total": 0.0, "wait_max": 0.0}
+
+    def _submit(self, index):
+        if index >= len(self.trials):
+            return
+        with self._lock:
+            if index in self._futures or index in self._buffer \
+                    or index in self._served:
+                return
+            # 予算を使い切っている間は先読みしない
+            if self._buffer.nbytes >= self._buffer.max_bytes:
+                return
+            fut = self._executor.submit(registry.run, self.trials[index])
+            self._futures[index] = fut
+        fut.add_done_callback(lambda f: self._store(index, f))
+
+    def _store(self, index, fut):
+        with self._lock:
+            self._futures.pop(index, None)
+            # get()が先に結果を受け取った試行は保持しない
+            if index in self._served:
+                return
+            if not fut.cancelled() and fut.exception() is None:
+                self._buffer.put(index, fut.result(), self._current)
+
+    def start(self, index=0):
+        """
+        Start generating trials index .. index + depth - 1.
+        """
+        for i in range(index, index + self.depth):
+            self._submit(i)
+
+    def get(self, index):
+        """
+        Return the stimulus of a trial and prefetch the following ones.
+
+        Parameters
+        ----------
+        index : int
+            Trial index.
+
+        Returns
+        -------
+        Output signal in ndarray().
+        """
+        start = time.perf_counter()
+        with self._lock:
+            self._served.add(index)
+            self._current = index
+        self.start(index + 1)
+        with self._lock:
+            if index in self._buffer:
+                sig = self._buffer.pop(index)
+                fut = None
+                self._metrics["hits"] += 1
+            else:
+                sig = None
+                fut = self._futures.get(index)
+
+        if sig is None and fut is not None:
+            # 生成中なので待つ
+            sig = fut.result()
+            with self._lock:
+                if index in self._buffer:
+                    self._buffer.pop(index)
+                self._metrics["late"] += 1
+        elif sig is None:
+            # 未投入か追い出された
+            sig = registry.run(self.trials[index])
+            with self._lock:
+                self._metrics["misses"] += 1
+
+        wait = time.perf_counter() - start
+        with self._lock:
+            self._metrics["wait_total"] += wait
+            self._metrics["wait_max"] = max(self._metrics["wait_max"], wait)
+
+        return sig
+
+    def stats(self):
+        """
+        Return hit/miss and wait-time metrics.
+
+        Returns
+        -------
+        dict with hits (ready in the buffer), late (still generating, had
+        to wait), misses (generated synchronously), wait_total / wait_max /
+        wait_mean in seconds, evictions and buffered_bytes.
+        """
+        with self._lock:
+            stats = dict(self._metrics)
+            stats["evictions"] = self._buffer.evictions
+            stats["buffered_bytes"] = self._buffer.nbytes
+        count = stats["hits"] + stats["late"] + stats["misses"]
+        stats["wait_mean"] = stats["wait_total"] / count if count else 0.0
+        return stats
+
+    def close(self):
+        """
+        Cancel pending work and shut down an owned executor.
+        """
+        with self._lock:
+            for fut in self._futures.values():
+                fut.cancel()
+        if self._own_executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
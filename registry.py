@@ -0,0 +1,413 @@
+import dataclasses
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+import akeroyd
+import bandpass
+import binaural_beat
+import level
+import oscar
+import pd_shift
+import phase_delay
+import phasewarp
+import pcm
+
+
+_REGISTRY = {}
+
+
+def _check_positive(**values):
+    for key, value in values.items():
+        if value <= 0:
+            raise ValueError("%s must be positive, got %r" % (key, value))
+
+
+def _check_choice(key, value, choices):
+    if value not in choices:
+        raise ValueError("%s must be one of %s, got %r" % (key, choices, value))
+
+
+def _check_band(srate, centre, bwd, shift=0):
+    # 通過帯域 (shift後も含む) が 0 ~ Nyquist に収まるか
+    low = centre - int(bwd / 2) - abs(shift)
+    high = centre + int(bwd / 2) + abs(shift)
+    if low < 0 or high >= srate / 2:
+        raise ValueError("band %s-%s Hz is outside 0-%s Hz"
+                         % (low, high, srate / 2))
+
+
+@dataclass(frozen=True)
+class AkeroydParams:
+    """
+    Parameters of akeroyd.Generate() / akeroyd.GenerateInitIpd().
+    GenerateInitIpd() is used when init_ipd is given. LUFS None leaves
+    the default of each function (-17 LUFS output for both).
+    """
+    srate: int
+    shift: int
+    duration: int
+    bwd: int
+    centre: int
+    init_direction: str
+    LUFS: Optional[float] = None
+    init_ipd: Optional[float] = None
+
+    def __post_init__(self):
+        _check_positive(srate=self.srate, shift=self.shift,
+                        duration=self.duration, bwd=self.bwd)
+        _check_choice("init_direction", self.init_direction,
+                      ("left", "right"))
+        _check_band(self.srate, self.centre, self.bwd, self.shift)
+
+
+@dataclass(frozen=True)
+class ToneBeatParams:
+    """
+    Parameters of binaural_beat.Generate().
+    """
+    srate: int
+    shift: float
+    duration: int
+    freq: float
+    LUFS: float = -17
+
+    def __post_init__(self):
+        _check_positive(srate=self.srate, duration=self.duration,
+                        freq=self.freq)
+        if self.freq + self.shift >= self.srate / 2:
+            raise ValueError("freq + shift must be below Nyquist")
+
+
+@dataclass(frozen=True)
+class NoiseParams:
+    """
+    Parameters of binaural_beat.GenerateNoise().
+    """
+    srate: int
+    bwd: int
+    centre: int
+    duration: int
+    phase: str
+
+    def __post_init__(self):
+        _check_positive(srate=self.srate, bwd=self.bwd,
+                        duration=self.duration)
+        _check_choice("phase", self.phase, ("same", "anti", "normal"))
+        _check_band(self.srate, self.centre, self.bwd)
+
+
+@dataclass(frozen=True)
+class BandpassParams:
+    """
+    Parameters of bandpass.generate().
+    """
+    srate: int
+    duration: int
+    bwd: int
+    centre: int
+    type: str = "Stereo"
+
+    def __post_init__(self):
+        _check_positive(srate=self.srate, bwd=self.bwd,
+                        duration=self.duration)
+        _check_choice("type", self.type, ("Stereo", "Mono"))
+        _check_band(self.srate, self.centre, self.bwd)
+
+
+@dataclass(frozen=True)
+class PhasewarpParams:
+    """
+    Parameters of phasewarp.generate().
+    """
+    srate: int
+    shift: int
+    duration: int
+    bwd: int
+    centre: int
+    init_direction: str
+
+    def __post_init__(self):
+        _check_positive(srate=self.srate, shift=self.shift,
+                        duration=self.duration, bwd=self.bwd)
+        _check_choice("init_direction", self.init_direction,
+                      ("left", "right"))
+        _check_band(self.srate, self.centre, self.bwd)
+        if self.shift > self.bwd:
+            raise ValueError("shift must not exceed bwd")
+
+
+@dataclass(frozen=True)
+class PdShiftParams:
+    """
+    Parameters of pd_shift.generate().
+    """
+    srate: int
+    shift: int
+    duration: int
+    bwd: int
+    centre: int
+    init_direction: str
+    delay: float
+
+    def __post_init__(self):
+        _check_positive(srate=self.srate, shift=self.shift,
+                        duration=self.duration, bwd=self.bwd)
+        _check_choice("init_direction", self.init_direction,
+                      ("left", "right"))
+        _check_band(self.srate, self.centre, self.bwd, self.shift)
+
+
+@dataclass(frozen=True)
+class PhaseDelayParams:
+    """
+    Parameters of phase_delay.generate().
+    """
+    srate: int
+    delay: float
+    duration: int
+    move_to: str
+
+    def __post_init__(self):
+        _check_positive(srate=self.srate, duration=self.duration)
+        _check_choice("move_to", self.move_to, ("left", "right"))
+
+
+@dataclass(frozen=True)
+class LevelParams:
+    """
+    Parameters of level.generate().
+    """
+    srate: int
+    fc_i: int
+    bwd_i: int
+    shft_freq_i: float
+    duration: int
+    law: str = "cosine"
+    max_ild: float = 20
+
+    def __post_init__(self):
+        _check_positive(srate=self.srate, bwd_i=self.bwd_i,
+                        duration=self.duration)
+        _check_choice("law", self.law, ("cosine", "power", "db"))
+        _check_band(self.srate, self.fc_i, self.bwd_i)
+
+
+@dataclass(frozen=True)
+class OscarParams:
+    """
+    Parameters of oscar.generate(). Lists are stored as tuples.
+    """
+    srate: int
+    fcs: Tuple[int, ...]
+    bwds: Tuple[int, ...]
+    shifts: Tuple[float, ...]
+    duration: int
+
+    def __post_init__(self):
+        for key in ("fcs", "bwds", "shifts"):
+            object.__setattr__(self, key,
+                               tuple(np.atleast_1d(getattr(self, key)).tolist()))
+        # 帯域数はすべて同じか1 (oscar.generateと同じbroadcast)
+        keys = ("fcs", "bwds", "shifts")
+        longest = max(keys, key=lambda k: len(getattr(self, k)))
+        bands = len(getattr(self, longest))
+        for key in keys:
+            if len(getattr(self, key)) not in (1, bands):
+                raise ValueError("%s has %d values but %s has %d"
+                                 % (key, len(getattr(self, key)), longest,
+                                    bands))
+        fcs, bwds, _ = np.broadcast_arrays(self.fcs, self.bwds, self.shifts)
+        _check_positive(srate=self.srate, duration=self.duration)
+        for fc, bwd in zip(fcs, bwds):
+            _check_band(self.srate, fc, bwd)
+
+
+@dataclass(frozen=True)
+class Job:
+    """
+    One generation request. Hashable and picklable.
+
+    Parameters
+    ----------
+    name : str
+        Registered generator name.
+    params : object
+        Parameter object of the generator.
+    seed : int
+        Seed of np.random before generation.(optional)
+    file_name : str
+        Output file name. If None, run() returns the signal.(optional)
+    format : str
+        Output sample format, see pcm.FORMATS. (default is float32)
+    """
+    name: str
+    params: object
+    seed: Optional[int] = None
+    file_name: Optional[str] = None
+    format: str = "float32"
+
+
+def register(name, params):
+    """
+    Register a generator function under a name.
+
+    Parameters
+    ----------
+    name : str
+        Generator name used by make() and run().
+    params : type
+        Parameter class. The decorated function receives an instance and
+        returns the signal as ndarray(), shape: (n,2).
+    """
+    def deco(func):
+        _REGISTRY[name] = (params, func)
+        return func
+    return deco
+
+
+def names():
+    """
+    Return the registered generator names.
+    """
+    return sorted(_REGISTRY)
+
+
+def params_of(name):
+    """
+    Return the parameter class of a generator.
+    """
+    if name not in _REGISTRY:
+        raise KeyError("unknown generator: %s" % name)
+    return _REGISTRY[name][0]
+
+
+def make(name, seed=None, file_name=None, format="float32", **params):
+    """
+    Build and validate a Job before any work runs.
+
+    Parameters
+    ----------
+    name : str
+        Registered generator name.
+    seed : int
+        Seed of np.random.(optional)
+    file_name : str
+        Output file name.(optional)
+    format : str
+        Output sample format, see pcm.FORMATS.(optional)
+    **params
+        Generator parameters.
+
+    Returns
+    -------
+    Job
+    """
+    if format not in pcm.FORMATS:
+        raise ValueError("unknown format: %s" % format)
+    return Job(name, params_of(name)(**params), seed, file_name, format)
+
+
+def run(job):
+    """
+    Run one job.
+
+    Parameters
+    ----------
+    job : Job
+
+    Returns
+    -------
+    Output signal in ndarray(), or the file name if job.file_name is set.
+    """
+    func = _REGISTRY[job.name][1]
+    if job.seed is not None:
+        np.random.seed(job.seed)
+    sig = func(job.params)
+    if job.file_name is None:
+        return sig
+    pcm.write(job.file_name, job.params.srate, sig, job.format)
+    return job.file_name
+
+
+def run_batch(jobs, workers=None, chunksize=8):
+    """
+    Run many jobs in a process pool.
+
+    Parameters
+    ----------
+    jobs : list of Job
+    workers : int
+        Number of processes. If 1, run in this process.(optional)
+    chunksize : int
+        Jobs sent to a worker at once.(optional)
+
+    Returns
+    -------
+    List of run() results in job order.
+    """
+    if workers == 1:
+        return [run(job) for job in jobs]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(run, jobs, chunksize=chunksize))
+
+
+def _kwargs(params):
+    return {key: value for key, value in dataclasses.asdict(params).items()
+            if value is not None}
+
+
+@register("akeroyd", AkeroydParams)
+def _akeroyd(p):
+    if p.init_ipd is None:
+        return akeroyd.Generate(**_kwargs(p))
+    return akeroyd.GenerateInitIpd(**_kwargs(p))
+
+
+@register("binaural_beat", ToneBeatParams)
+def _binaural_beat(p):
+    return binaural_beat.Generate(**_kwargs(p))
+
+
+@register("noise", NoiseParams)
+def _noise(p):
+    return binaural_beat.GenerateNoise(**_kwargs(p))
+
+
+@register("bandpass", BandpassParams)
+def _bandpass(p):
+    return bandpass.generate(p.srate, p.duration, p.bwd, p.centre, p.type,
+                             wav=False)
+
+
+@register("phasewarp", PhasewarpParams)
+def _phasewarp(p):
+    return phasewarp.generate(p.srate, p.shift, p.duration, p.bwd, p.centre,
+                              p.init_direction, wav=False)
+
+
+@register("pd_shift", PdShiftParams)
+def _pd_shift(p):
+    return pd_shift.generate(p.srate, p.shift, p.duration, p.bwd, p.centre,
+                             p.init_direction, p.delay, wav=False)
+
+
+@register("phase_delay", PhaseDelayParams)
+def _phase_delay(p):
+    return phase_delay.generate(p.srate, p.delay, p.duration, p.move_to,
+                                wav=False)
+
+
+@register("level", LevelParams)
+def _level(p):
+    return level.generate(p.srate, p.fc_i, p.bwd_i, p.shft_freq_i,
+                          p.duration, p.law, p.max_ild, wav=False)
+
+
+@register("oscar", OscarParams)
+def _oscar(p):
+    return oscar.generate(p.srate, list(p.fcs), list(p.bwds), list(p.shifts),
+                          p.duration, wav=False)
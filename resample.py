@@ -0,0 +1,112 @@
+import functools
+import math
+
+import numpy as np
+import fftbackend
+
+
+@functools.lru_cache(maxsize=None)
+def _ratio(srate_in, srate_out):
+    g = math.gcd(int(srate_in), int(srate_out))
+    return int(srate_out) // g, int(srate_in) // g
+
+
+@functools.lru_cache(maxsize=32)
+def _design(up, down, half_len=10, beta=5.0):
+    """
+    Anti-aliasing FIR of the polyphase resampler for one rate pair,
+    the same design as scipy.signal.resample_poly.
+    """
+    from scipy.signal import firwin
+
+    max_rate = max(up, down)
+    h = firwin(2 * half_len * max_rate + 1, 1 / max_rate,
+               window=("kaiser", beta))
+    h.flags.writeable = False
+    return h
+
+
+def _fft(signal, n_out):
+    # 周期信号として片側スペクトルを切り詰め/ゼロ詰め
+    n = len(signal)
+    spec = fftbackend.rfft(signal, axis=0)
+    m = n_out // 2 + 1
+    out = np.zeros((m,) + spec.shape[1:], dtype=spec.dtype)
+    k = min(m, len(spec))
+    out[:k] = spec[:k]
+    if n_out > n and n % 2 == 0:
+        # 元のNyquist binは正負の2binに分かれる
+        out[n // 2] *= 0.5
+    elif n_out < n and n_out % 2 == 0:
+        # 新しいNyquist binには正負のbinが重なる
+        out[m - 1] = 2 * out[m - 1].real
+    return fftbackend.irfft(out, n=n_out, axis=0) * (n_out / n)
+
+
+def resample(signal, srate_in, srate_out, method="polyphase"):
+    """
+    Convert the sampling rate of a generated stimulus.
+    Requires:
+        numpy
+        scipy
+
+    Parameters
+    ----------
+    signal : ndarray()
+        shape: (n,) or (n,channels)
+    srate_in : int
+        Sampling rate of signal in Hz.
+    srate_out : int
+        Target sampling rate in Hz.
+    method : str
+        "polyphase": FIR polyphase filter, the filter is designed once per
+        rate pair and cached.
+        "fft": truncate or zero-pad the spectrum. Exact for the periodic
+        stimuli synthesized by the generators (whole-file IFFT), requires
+        n * srate_out / srate_in to be an integer. (default is polyphase)
+
+    Returns
+    -------
+    Output signal in ndarray() with the input dtype.
+    """
+    signal = np.asarray(signal)
+    if srate_in == srate_out:
+        return signal.copy()
+
+    up, down = _ratio(srate_in, srate_out)
+    if method == "polyphase":
+        from scipy.signal import resample_poly
+        out = resample_poly(signal, up, down, axis=0,
+                            window=_design(up, down))
+    elif method == "fft":
+        if (len(signal) * up) % down:
+            raise ValueError("%d samples at %d Hz do not map to an integer "
+                             "length at %d Hz" % (len(signal), srate_in,
+                                                  srate_out))
+        out = _fft(signal, len(signal) * up // down)
+    else:
+        raise ValueError("unknown method: %s" % method)
+
+    return out.astype(signal.dtype, copy=False)
+
+
+def to_rates(signal, srate, rates, method="polyphase"):
+    """
+    Derive one master stimulus at several sampling rates.
+
+    Parameters
+    ----------
+    signal : ndarray()
+        Master stimulus, shape: (n,) or (n,channels)
+    srate : int
+        Sampling rate of the master in Hz.
+    rates : list of int
+        Target sampling rates in Hz.
+    method : str
+        See resample(). (default is polyphase)
+
+    Returns
+    -------
+    dict of {rate: ndarray()}. The noise token is the same at every rate.
+    """
+    return {rate: resample(signal, srate, rate, method) for rate in rates}
@@ -0,0 +1,201 @@
+import dataclasses
+import json
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import registry
+import pcm
+from prefetch import Prefetcher
+import lazy
+
+sf = lazy.load("soundfile")
+
+
+@dataclass(frozen=True)
+class Trial:
+    """
+    One stimulus of a session.
+
+    Parameters
+    ----------
+    source : registry.Job, str or callable
+        Registry job (file_name must be None), wav file path (read block by
+        block), or a function returning the signal, shape: (n,2).
+    gap : float
+        Silence after the stimulus in seconds.(optional)
+    ramp : float
+        Cosine ramp length in milliseconds at onset and offset, the same
+        window as modulation.CosRamp(). 0 for none.(optional)
+    label : str
+        Name written to the onset index.(optional)
+    """
+    source: object
+    gap: float = 0.0
+    ramp: float = 10.0
+    label: str = ""
+
+
+def _ramp(srate, ramp):
+    # modulation.CosRampと同じ窓
+    length = int(ramp * srate / 1000)
+    cos = (1 - np.cos(np.pi * np.arange(length * 2) / length)) / 2 \
+        if length else np.zeros(0)
+    return length, cos
+
+
+def _gain(start, m, n, length, cos):
+    # 刺激内の start ~ start+m サンプル目の窓
+    # (短い刺激ではonsetとoffsetが重なり, CosRampと同じく掛け合わせる)
+    gain = np.ones(m)
+    if length == 0:
+        return gain
+    pos = np.arange(start, start + m)
+    on = pos < length - 1
+    gain[on] = cos[pos[on]]
+    off = pos >= n - length
+    gain[off] *= cos[length + pos[off] - (n - length)]
+    return gain
+
+
+def _blocks(trial, srate, block, pull):
+    # (総サンプル数, blockのiterator) を返す
+    source = trial.source
+    if isinstance(source, str):
+        src = sf.SoundFile(source)
+        if src.samplerate != srate:
+            src.close()
+            raise ValueError("%s is %d Hz, session is %d Hz"
+                             % (source, src.samplerate, srate))
+
+        def read():
+            with src:
+                for data in src.blocks(blocksize=block, always_2d=True):
+                    yield data
+        return src.frames, read()
+
+    sig = np.asarray(pull())
+    if sig.ndim == 1:
+        sig = sig[:, np.newaxis]
+    return len(sig), (sig[start:start + block]
+                      for start in range(0, len(sig), block))
+
+
+def assemble(trials, file_name, srate, channels=2, format="float32",
+             block=65536, lead=0.0, index_file=None, prefetch=0, **kwargs):
+    """
+    Stream a session of trials (ramped stimulus, silence, next stimulus)
+    into one wav file. Stimuli are generated or read one at a time and
+    written block by block, so memory does not depend on the session
+    length.
+    Requires:
+        numpy
+        pysoundfile
+
+    Parameters
+    ----------
+    trials : list of Trial
+        Trials in presentation order.
+    file_name : str
+        Output wav file path.
+    srate : int
+        Sampling rate of the session in Hz.
+    channels : int
+        Number of channels.(optional)
+    format : str
+        Output sample format, see pcm.FORMATS. (default is float32)
+    block : int
+        Block length in samples.(optional)
+    lead : float
+        Silence before the first trial in seconds.(optional)
+    index_file : str
+        Onset index path. Default is file_name with "_onsets.jsonl".
+        (optional)
+    prefetch : int
+        Generate this many upcoming registry jobs ahead in background
+        processes (Prefetcher). 0 generates each job when it is
+        reached.(optional)
+    kwargs
+        Other Prefetcher parameters (max_bytes, workers).
+
+    Returns
+    -------
+    pcm.ClipStats of the session.
+
+    The index has one JSON line per trial with "trial", "label",
+    "onset" and "offset" (samples), "onset_s" (seconds) and, for registry
+    jobs, "generator", "params" and "seed".
+    """
+    if index_file is None:
+        index_file = os.path.splitext(file_name)[0] + "_onsets.jsonl"
+
+    jobs = [t.source for t in trials if isinstance(t.source, registry.Job)]
+    fetcher = None
+    if prefetch and jobs:
+        fetcher = Prefetcher(jobs, prefetch, **kwargs)
+        fetcher.start()
+
+    silence = np.zeros((block, channels))
+
+    def pad(samples):
+        # 無音をblock毎に書く
+        for start in range(0, samples, block):
+            dst.write(silence[:min(block, samples - start)])
+
+    try:
+        with pcm.Writer(file_name, srate, channels, format) as dst, \
+                open(index_file, "w") as index:
+            pad(int(round(lead * srate)))
+            job_index = 0
+            for i, trial in enumerate(trials):
+                source = trial.source
+                if isinstance(source, registry.Job):
+                    if source.params.srate != srate:
+                        raise ValueError("trial %d is %d Hz, session is %d Hz"
+                                         % (i, source.params.srate, srate))
+                    if fetcher is not None:
+                        pull = (lambda k=job_index: fetcher.get(k))
+                    else:
+                        pull = (lambda job=source: registry.run(job))
+                    job_index += 1
+                else:
+                    pull = source
+
+                n, parts = _blocks(trial, srate, block, pull)
+                length, cos = _ramp(srate, trial.ramp)
+                onset = dst.frames
+                start = 0
+                for data in parts:
+                    if data.shape[1] != channels:
+                        raise ValueError("trial %d has %d channels, "
+                                         "session has %d"
+                                         % (i, data.shape[1], channels))
+                    gain = _gain(start, len(data), n, length, cos)
+                    dst.write(data * gain[:, np.newaxis])
+                    start += len(data)
+
+                entry = {"trial": i, "label": trial.label, "onset": onset,
+                         "offset": onset + n, "onset_s": onset / srate}
+                if isinstance(source, registry.Job):
+                    entry["generator"] = source.name
+                    entry["params"] = dataclasses.asdict(source.params)
+                    entry["seed"] = source.seed
+                index.write(json.dumps(entry) + "\n")
+
+                pad(int(round(trial.gap * srate)))
+    finally:
+        if fetcher is not None:
+            fetcher.close()
+    return dst.stats
+
+
+def read_index(index_file):
+    """
+    Read an onset index written by assemble().
+
+    Returns
+    -------
+    List of dict, one per trial.
+    """
+    with open(index_file) as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -0,0 +1,255 @@
+import asyncio
+import json
+import socket
+from collections import OrderedDict
+
+import numpy as np
+import registry
+
+
+class StimulusServer:
+    """
+    Local asyncio service that generates stimuli on request.
+
+    Protocol (one JSON object per line):
+        {"generator": "akeroyd", "params": {...}, "seed": 1}
+            -> header line {"status": "ok", "shape": [n, 2], "srate": ...,
+               "nbytes": ...} followed by nbytes of float32 samples.
+               With "file_name" the stimulus is written there instead and
+               only the header is sent.
+               "format" selects the sample format of the file (pcm.FORMATS).
+        {"prefetch": [request, ...]}
+            -> {"status": "queued", "count": k}, generation runs in the
+               background and later requests for the same job are served
+               from the cache. Requests without seed (and without
+               file_name) are not queued, each of them gets fresh noise.
+    Errors are answered with {"status": "error", "message": ...}.
+
+    Parameters
+    ----------
+    executor : concurrent.futures.Executor
+        Executor for the NumPy work. Default is a ProcessPoolExecutor.
+        Must run jobs in separate processes: registry.run() seeds the
+        global np.random state, so threads would mix the noise of
+        concurrent seeded jobs. A ThreadPoolExecutor raises ValueError.
+    cache_size : int
+        Number of finished stimuli kept for repeated/prefetched requests.
+        Only seeded jobs and file outputs are cached; identical unseeded
+        requests share work only while they are in flight.
+    """
+
+    def __init__(self, executor=None, cache_size=32):
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+        if executor is None:
+            executor = ProcessPoolExecutor()
+        elif isinstance(executor, ThreadPoolExecutor):
+            raise ValueError("StimulusServer needs a process executor "
+                             "(registry.run seeds the global RNG)")
+        self._executor = executor
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._inflight = {}
+
+    async def get(self, job):
+        """
+        Return the result of a job, sharing work with identical requests.
+
+        Parameters
+        ----------
+        job : registry.Job
+
+        Returns
+        -------
+        Output signal in ndarray(), or the file name.
+        """
+        if job in self._cache:
+            self._cache.move_to_end(job)
+            return self._cache[job]
+
+        fut = self._inflight.get(job)
+        if fut is None:
+            loop = asyncio.get_running_loop()
+            fut = loop.run_in_executor(self._executor, registry.run, job)
+            self._inflight[job] = fut
+            fut.add_done_callback(lambda f: self._done(job, f))
+        # 他の待ち手がキャンセルされても生成は続ける
+        return await asyncio.shield(fut)
+
+    def _done(self, job, fut):
+        self._inflight.pop(job, None)
+        if fut.cancelled() or fut.exception() is not None:
+            return
+        if not _reusable(job):
+            return
+        self._cache[job] = fut.result()
+        self._cache.move_to_end(job)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def prefetch(self, jobs):
+        """
+        Start generating jobs in the background.
+
+        Parameters
+        ----------
+        jobs : list of registry.Job
+
+        Returns
+        -------
+        Number of jobs queued.
+        """
+        count = 0
+        for job in jobs:
+            if not _reusable(job):
+                # 結果を後の要求に渡せない
+                continue
+            count += 1
+            if job not in self._cache and job not in self._inflight:
+                task = asyncio.ensure_future(self.get(job))
+                # 失敗は実際に要求された時に報告する
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return count
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if "prefetch" in request:
+                        jobs = [_job(r) for r in request["prefetch"]]
+                        count = self.prefetch(jobs)
+                        _send(writer, {"status": "queued", "count": count})
+                    else:
+                        job = _job(request)
+                        result = await self.get(job)
+                        _send_result(writer, job, result)
+                except Exception as e:
+                    _send(writer, {"status": "error", "message": str(e)})
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve_unix(self, path):
+        """
+        Serve on a UNIX socket until cancelled.
+        """
+        server = await asyncio.start_unix_server(self._handle, path)
+        async with server:
+            await server.serve_forever()
+
+    async def serve_tcp(self, port, host="127.0.0.1"):
+        """
+        Serve on a localhost TCP port until cancelled.
+        """
+        server = await asyncio.start_server(self._handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def _reusable(job):
+    # seedなしのnoiseは要求毎に新しく生成する
+    return job.seed is not None or job.file_name is not None
+
+
+def _job(request):
+    return registry.make(request["generator"], seed=request.get("seed"),
+                         file_name=request.get("file_name"),
+                         format=request.get("format", "float32"),
+                         **request["params"])
+
+
+def _send(writer, header):
+    writer.write(json.dumps(header).encode() + b"\n")
+
+
+def _send_result(writer, job, result):
+    if job.file_name is not None:
+        _send(writer, {"status": "ok", "file_name": result})
+        return
+    data = np.ascontiguousarray(result, dtype=np.float32)
+    _send(writer, {"status": "ok", "shape": list(data.shape),
+                   "srate": job.params.srate, "nbytes": data.nbytes})
+    writer.write(data.tobytes())
+
+
+class Client:
+    """
+    Blocking client for StimulusServer.
+
+    Parameters
+    ----------
+    address : str or (str, int)
+        UNIX socket path, or (host, port) for TCP.
+    """
+
+    def __init__(self, address):
+        if isinstance(address, str):
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.connect(address)
+        self._file = self._sock.makefile("rwb")
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def _request(self, request):
+        self._file.write(json.dumps(request).encode() + b"\n")
+        self._file.flush()
+        header = json.loads(self._file.readline())
+        if header["status"] == "error":
+            raise RuntimeError(header["message"])
+        return header
+
+    def get(self, generator, seed=None, file_name=None, format="float32",
+            **params):
+        """
+        Request a stimulus.
+
+        Returns
+        -------
+        Output signal in ndarray() (float32), or the file name.
+        """
+        header = self._request({"generator": generator, "params": params,
+                                "seed": seed, "file_name": file_name,
+                                "format": format})
+        if "file_name" in header:
+            return header["file_name"]
+        data = self._file.read(header["nbytes"])
+        return np.frombuffer(data, dtype=np.float32).reshape(header["shape"])
+
+    def prefetch(self, requests):
+        """
+        Queue stimuli for background generation.
+
+        Parameters
+        ----------
+        requests : list of dict
+            {"generator": ..., "params": {...}, "seed": ...} per stimulus.
+        """
+        return self._request({"prefetch": list(requests)})["count"]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="stimulus generation service")
+    parser.add_argument("--unix", help="UNIX socket path")
+    parser.add_argument("--port", type=int, help="localhost TCP port")
+    parser.add_argument("--cache", type=int, default=32)
+    args = parser.parse_args()
+
+    server = StimulusServer(cache_size=args.cache)
+    if args.unix:
+        asyncio.run(server.serve_unix(args.unix))
+    else:
+        asyncio.run(server.serve_tcp(args.port or 8765))
+
+
+if __name__ == "__main__":
+    main()
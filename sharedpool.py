@@ -0,0 +1,203 @@
+import dataclasses
+import os
+import sys
+import uuid
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Tuple
+
+import numpy as np
+import registry
+import pcm
+
+
+@dataclass(frozen=True)
+class Handle:
+    """
+    Reference to a stimulus rendered by a worker. Only this small object is
+    pickled back to the parent; the samples stay in shared memory or in a
+    memmapped .npy file.
+
+    Parameters
+    ----------
+    kind : str
+        "shm" or "memmap".
+    name : str
+        Shared memory block name or .npy file path.
+    shape : tuple of int
+        Shape of the signal, (n, 2) for stereo stimuli.
+    dtype : str
+        numpy dtype string of the samples.
+    srate : int
+        Sampling rate of the stimulus.
+    """
+    kind: str
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+    srate: int
+
+
+def _create(size):
+    # 親が後始末するので子の resource tracker には登録しない
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(create=True, size=size, track=False)
+    from multiprocessing import resource_tracker
+    block = shared_memory.SharedMemory(create=True, size=size)
+    resource_tracker.unregister(block._name, "shared_memory")
+    return block
+
+
+def _render(args):
+    job, kind, directory, dtype = args
+    sig = registry.run(dataclasses.replace(job, file_name=None))
+    sig = np.asarray(sig)
+    shape = sig.shape
+    srate = job.params.srate
+
+    if kind == "shm":
+        size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        block = _create(size)
+        np.ndarray(shape, dtype, buffer=block.buf)[...] = sig
+        del sig
+        block.close()
+        return Handle("shm", block.name, shape, np.dtype(dtype).str, srate)
+
+    path = os.path.join(directory, "%s.npy" % uuid.uuid4().hex)
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+    out[...] = sig
+    out.flush()
+    del out
+    return Handle("memmap", path, shape, np.dtype(dtype).str, srate)
+
+
+class SharedPool:
+    """
+    Process pool for registry jobs that returns handles instead of arrays.
+
+    Workers copy the generated stimulus once into a shared memory block (or
+    a memmapped .npy file) and send back only a Handle, so long stimuli are
+    not pickled through the result pipe. The parent maps the samples with
+    open() and owns the blocks until release() or close().
+    Requires:
+        numpy
+
+    Parameters
+    ----------
+    workers : int
+        Number of processes.(optional)
+    kind : str
+        "shm" (multiprocessing.shared_memory) or "memmap" (.npy files in
+        directory). (default is shm)
+    directory : str
+        Directory of the memmapped files. Required for "memmap".(optional)
+    dtype : str
+        Sample type of the rendered stimuli. (default is float32, the type
+        of the wav files)
+    """
+
+    def __init__(self, workers=None, kind="shm", directory=None,
+                 dtype="float32"):
+        if kind not in ("shm", "memmap"):
+            raise ValueError("unknown kind: %s" % kind)
+        if kind == "memmap":
+            if directory is None:
+                raise ValueError("memmap needs a directory")
+            os.makedirs(directory, exist_ok=True)
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.kind = kind
+        self.directory = directory
+        self.dtype = dtype
+        self._pool = ProcessPoolExecutor(workers)
+        self._open = {}
+        self._owned = set()
+
+    def submit(self, job):
+        """
+        Render one job in the background.
+
+        Returns
+        -------
+        concurrent.futures.Future of a Handle.
+        """
+        future = self._pool.submit(_render, (job, self.kind, self.directory,
+                                             self.dtype))
+        future.add_done_callback(self._own)
+        return future
+
+    def map(self, jobs):
+        """
+        Render many jobs. Every block is owned by the pool as soon as its
+        job finishes, so close() also frees the handles of an iteration
+        that stopped early or failed.
+
+        Returns
+        -------
+        Iterator of Handles in job order.
+        """
+        futures = [self.submit(job) for job in jobs]
+        return (future.result() for future in futures)
+
+    def _own(self, future):
+        if future.exception() is None:
+            self._owned.add(future.result())
+
+    def open(self, handle):
+        """
+        Map the samples of a handle without copying.
+
+        Returns
+        -------
+        ndarray() view, valid until release(handle).
+        """
+        if handle.kind == "shm":
+            if handle not in self._open:
+                self._open[handle] = shared_memory.SharedMemory(handle.name)
+            block = self._open[handle]
+            return np.ndarray(handle.shape, handle.dtype, buffer=block.buf)
+        return np.load(handle.name, mmap_mode="r")
+
+    def write(self, handle, file_name, format="float32"):
+        """
+        Write a rendered stimulus to a wav file straight from the mapping.
+
+        Returns
+        -------
+        pcm.ClipStats
+        """
+        return pcm.write(file_name, handle.srate, self.open(handle), format)
+
+    def release(self, handle):
+        """
+        Free the shared memory block or delete the file of a handle. Arrays
+        from open() must not be used afterwards.
+        """
+        self._owned.discard(handle)
+        if handle.kind == "shm":
+            block = self._open.pop(handle, None)
+            if block is None:
+                block = shared_memory.SharedMemory(handle.name)
+            try:
+                block.close()
+            except BufferError:
+                # open()の配列がまだ残っている; 解放はその配列が消えた時
+                pass
+            block.unlink()
+        elif os.path.exists(handle.name):
+            os.remove(handle.name)
+
+    def close(self):
+        """
+        Shut the workers down and release every remaining handle.
+        """
+        self._pool.shutdown(wait=True)
+        for handle in list(self._owned):
+            self.release(handle)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,48 @@
+import pytest
+
+import memplan
+import registry
+
+SRATE = 48000
+DURATION = 2
+# 固定分 (_OVERHEAD) に隠れないよう1サンプルあたりでも比べる
+SLACK = 1
+
+_band = dict(srate=SRATE, bwd=400, centre=500)
+_shifted = dict(_band, shift=2, init_direction="left")
+PARAMS = {
+    "akeroyd": _shifted,
+    "pd_shift": dict(_shifted, delay=1),
+    "phasewarp": _shifted,
+    "phase_delay": dict(srate=SRATE, delay=1, move_to="right"),
+    "noise": dict(_band, phase="normal"),
+    "bandpass": _band,
+    "binaural_beat": dict(srate=SRATE, shift=4, freq=500),
+    "level": dict(srate=SRATE, fc_i=500, bwd_i=400, shft_freq_i=2),
+}
+
+
+def _job(name, strategy):
+    params = dict(PARAMS[name])
+    if strategy in ("analytic", "crop"):
+        params["init_ipd"] = 90
+    return registry.make(name, seed=1, duration=DURATION, **params)
+
+
+@pytest.mark.parametrize("name,strategy", sorted(memplan._PER_SAMPLE))
+def test_estimate_covers_measured_peak(name, strategy):
+    job = _job(name, strategy)
+    peak, per_sample = memplan.calibrate(job, strategy)
+    assert peak <= memplan.estimate(name, job.params, strategy)
+    assert per_sample <= memplan._PER_SAMPLE[(name, strategy)] + SLACK
+
+
+@pytest.mark.parametrize("bands", [1, 2, 4])
+def test_estimate_covers_oscar(bands):
+    job = registry.make("oscar", seed=1, srate=SRATE, duration=DURATION,
+                        fcs=tuple(500 + 300 * b for b in range(bands)),
+                        bwds=(100,) * bands, shifts=(2,) * bands)
+    peak, per_sample = memplan.calibrate(job)
+    assert peak <= memplan.estimate("oscar", job.params)
+    assert per_sample <= (memplan._OSCAR_BASE
+                          + memplan._OSCAR_PER_BAND * bands + SLACK)
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+import soundfile as sf
+
+import modulation
+import sequence
+
+SRATE = 48000
+
+
+@pytest.mark.parametrize("n", [600, 960, 5000])
+def test_ramp_matches_cosramp(tmp_path, n):
+    # 10 msは480サンプル, n < 960ではonsetとoffsetが重なる
+    rng = np.random.default_rng(0)
+    sig = rng.uniform(-0.5, 0.5, size=(n, 2))
+    file_name = str(tmp_path / "session.wav")
+
+    sequence.assemble([sequence.Trial(lambda: sig, ramp=10.0)], file_name,
+                      SRATE, block=256)
+    out, _ = sf.read(file_name, always_2d=True)
+
+    expected = modulation.CosRamp(data=sig.copy(), srate=SRATE, length=10.0)
+    np.testing.assert_allclose(out, expected.astype(np.float32), atol=1e-7)
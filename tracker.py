@@ -0,0 +1,167 @@
+import numpy as np
+import analysis
+import lazy
+
+sf = lazy.load("soundfile")
+
+
+class Tracker:
+    """
+    Streaming short-time IPD/ILD tracker for stereo signals.
+
+    Blocks of any length are fed to process(); the samples that do not yet
+    complete a frame are kept for the next call, so memory use does not
+    depend on the signal length.
+
+    Parameters
+    ----------
+    srate : int
+        Sampling rate in Hz.
+    bands : list of (float, float)
+        Frequency bands (low, high) in Hz. Default is the whole spectrum.
+    n_fft : int
+        Frame length in samples.(optional)
+    hop : int
+        Hop size in samples.(optional)
+    """
+
+    def __init__(self, srate, bands=None, n_fft=2048, hop=512):
+        self.srate = srate
+        self.n_fft = n_fft
+        self.hop = hop
+        if bands is None:
+            bands = [(0, srate / 2)]
+        freqs = np.fft.rfftfreq(n_fft, 1 / srate)
+        self.bands = [tuple(b) for b in bands]
+        self._masks = np.array([(freqs >= lo) & (freqs <= hi)
+                                for lo, hi in self.bands], dtype=float)
+        self._buffer = np.zeros((0, 2), dtype=np.float32)
+        self._frames = 0
+
+    def process(self, block):
+        """
+        Consume a block and return the trajectories of the completed frames.
+
+        Parameters
+        ----------
+        block : ndarray()
+            shape: (n,2)
+
+        Returns
+        -------
+        times (frames,), IPD (frames, bands) in radians (right relative to
+        left) and ILD (frames, bands) in dB (left over right), float32.
+        """
+        buffer = np.concatenate([self._buffer,
+                                 np.asarray(block, dtype=np.float32)])
+        count = 0
+        if len(buffer) >= self.n_fft:
+            count = (len(buffer) - self.n_fft) // self.hop + 1
+
+        if count == 0:
+            self._buffer = buffer
+            empty = np.zeros((0, len(self.bands)), dtype=np.float32)
+            return np.zeros(0, dtype=np.float32), empty, empty
+
+        used = (count - 1) * self.hop + self.n_fft
+        spec = analysis.stft(buffer[:used].T, self.n_fft, self.hop)
+        self._buffer = buffer[count * self.hop:]
+
+        # 帯域ごとにまとめる (frames, bands)
+        cross = (spec[1] * np.conj(spec[0])) @ self._masks.T
+        power_l = (np.abs(spec[0]) ** 2) @ self._masks.T
+        power_r = (np.abs(spec[1]) ** 2) @ self._masks.T
+
+        tiny = np.finfo(float).tiny
+        ipd = np.angle(cross).astype(np.float32)
+        ild = (10 * np.log10((power_l + tiny) / (power_r + tiny))) \
+            .astype(np.float32)
+
+        index = np.arange(self._frames, self._frames + count)
+        times = ((index * self.hop + self.n_fft / 2) / self.srate) \
+            .astype(np.float32)
+        self._frames += count
+        return times, ipd, ild
+
+
+def iter_file(file_name, bands=None, n_fft=2048, hop=512, block=2**16):
+    """
+    Track a stereo wav file block by block.
+    Requires:
+        numpy
+        pysoundfile
+
+    Parameters
+    ----------
+    file_name : str
+        Stereo wav file path.
+    bands : list of (float, float)
+        Frequency bands in Hz.(optional)
+    n_fft : int
+        Frame length in samples.(optional)
+    hop : int
+        Hop size in samples.(optional)
+    block : int
+        Samples read per block.(optional)
+
+    Returns
+    -------
+    Generator of (times, IPD, ILD) per block, see Tracker.process().
+    """
+    with sf.SoundFile(file_name) as src:
+        tracker = Tracker(src.samplerate, bands, n_fft, hop)
+        for data in src.blocks(blocksize=block, dtype="float32",
+                               always_2d=True):
+            times, ipd, ild = tracker.process(data[:, :2])
+            if len(times):
+                yield times, ipd, ild
+
+
+def track_file(file_name, bands=None, n_fft=2048, hop=512, block=2**16):
+    """
+    Collect the float32 IPD/ILD trajectories of a whole wav file.
+
+    Returns
+    -------
+    dict with "times" (frames,), "ipd" and "ild" (frames, bands), float32.
+    """
+    parts = list(iter_file(file_name, bands, n_fft, hop, block))
+    if not parts:
+        n = 1 if bands is None else len(bands)
+        empty = np.zeros((0, n), dtype=np.float32)
+        return {"times": np.zeros(0, dtype=np.float32), "ipd": empty,
+                "ild": empty}
+    times, ipd, ild = zip(*parts)
+    return {"times": np.concatenate(times), "ipd": np.concatenate(ipd),
+            "ild": np.concatenate(ild)}
+
+
+def decimate(times, values, max_points=4000):
+    """
+    Min/max decimation of a trajectory for plotting.
+
+    Parameters
+    ----------
+    times : ndarray()
+        shape: (frames,)
+    values : ndarray()
+        shape: (frames,) or (frames, bands)
+    max_points : int
+        Upper bound of the returned points.(optional)
+
+    Returns
+    -------
+    times and values with at most max_points rows. Each bucket is
+    represented by its minimum and maximum so peaks stay visible.
+    """
+    n = len(times)
+    if n <= max_points:
+        return times, values
+    size = int(np.ceil(n / (max_points // 2)))
+    usable = (n // size) * size
+    v = values[:usable].reshape((-1, size) + values.shape[1:])
+    t = times[:usable].reshape(-1, size)
+    out_t = np.repeat(t[:, [0, -1]].mean(axis=1), 2)
+    out_v = np.stack([v.min(axis=1), v.max(axis=1)], axis=1) \
+        .reshape((-1,) + values.shape[1:])
+    return out_t, out_v
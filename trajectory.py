@@ -0,0 +1,123 @@
+import numpy as np
+
+
+def resolve(trajectory, srate: int, length: int):
+    """
+    Turn a parameter trajectory into one value per sample.
+    Requires:
+        numpy
+
+    Parameters
+    ----------
+    trajectory : float, ndarray() or list
+        Constant value, array of values spread evenly over the whole
+        signal (resampled linearly if its length differs from length), or
+        piecewise-linear breakpoints [(time in seconds, value), ...] (any
+        2-D array-like of shape (k, 2)).
+        Values before the first / after the last breakpoint are held.
+    srate : int
+        Sampling rate in Hz.
+    length : int
+        Number of samples.
+
+    Returns
+    -------
+    Per-sample values in ndarray().
+    """
+    return resolve_range(trajectory, srate, length, 0, length)
+
+
+def resolve_range(trajectory, srate: int, length: int, start: int, stop: int):
+    """
+    resolve() for the samples start to stop only, so long signals can be
+    processed block by block. Samples outside 0 to length hold the end
+    values.
+
+    Parameters
+    ----------
+    trajectory : float, ndarray() or list
+        See resolve().
+    srate : int
+        Sampling rate in Hz.
+    length : int
+        Total number of samples. Only used by array trajectories.
+    start : int
+        First sample.
+    stop : int
+        Sample after the last one.
+
+    Returns
+    -------
+    Per-sample values in ndarray(), length stop - start.
+    """
+    if np.ndim(trajectory) == 0:
+        return np.full(stop - start, float(trajectory))
+
+    index = np.arange(start, stop)
+    if np.ndim(trajectory) == 2:
+        points = np.asarray(trajectory, dtype=float)
+        return np.interp(index / srate, points[:, 0], points[:, 1])
+
+    values = np.asarray(trajectory, dtype=float)
+    if len(values) == length:
+        return values[np.clip(index, 0, length - 1)]
+    # 全体に均等に配置して線形補間
+    pos = np.linspace(0, length - 1, len(values))
+    return np.interp(index, pos, values)
+
+
+def cumulative_phase(freq, srate: int, init_phase: float = 0):
+    """
+    Integrate instantaneous frequency to phase.
+
+    Parameters
+    ----------
+    freq : ndarray()
+        Instantaneous frequency in Hz, one value per sample.
+    srate : int
+        Sampling rate in Hz.
+    init_phase : float
+        Phase at the first sample in radians.(optional)
+
+    Returns
+    -------
+    Phase in radians as ndarray(), phase[n] = init + 2pi * sum(freq[:n]) / srate.
+    """
+    phase = np.empty(len(freq))
+    phase[0] = 0
+    np.cumsum(freq[:-1], out=phase[1:])
+    phase *= 2 * np.pi / srate
+    phase += init_phase
+    return phase
+
+
+def phase_blocks(trajectory, srate: int, length: int, block: int,
+                 init_phase: float = 0):
+    """
+    Streaming version of cumulative_phase(resolve(...)).
+
+    Parameters
+    ----------
+    trajectory : float, ndarray() or list
+        See resolve().
+    srate : int
+        Sampling rate in Hz.
+    length : int
+        Total number of samples.
+    block : int
+        Block length in samples.
+    init_phase : float
+        Phase at the first sample in radians.(optional)
+
+    Returns
+    -------
+    Generator of phase blocks in ndarray(). The phase is continuous across
+    block boundaries.
+    """
+    phase0 = init_phase
+    for start in range(0, length, block):
+        f = resolve_range(trajectory, srate, length, start,
+                          min(start + block, length))
+        phase = cumulative_phase(f, srate, phase0)
+        phase0 = phase[-1] + 2 * np.pi * f[-1] / srate
+        yield phase
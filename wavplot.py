@@ -1,8 +1,10 @@
-import matplotlib.pyplot as plt
-import matplotlib as mpl
-import librosa
 import numpy as np
 import time
+import lazy
+
+plt = lazy.load("matplotlib.pyplot")
+mpl = lazy.load("matplotlib")
+librosa = lazy.load("librosa")
 
 
 def make_waveform_pyplot(filename):
@@ -18,3 +20,30 @@ def make_waveform_pyplot(filename):
     ax.set_xlabel("Time")
     ax.plot(time_array, y)
     plt.show()
+
+
+def make_trajectory_pyplot(track, max_points=4000):
+    """
+    Plot IPD and ILD trajectories from tracker.track_file().
+
+    Parameters
+    ----------
+    track : dict
+        "times", "ipd" and "ild" as returned by tracker.track_file().
+    max_points : int
+        Points per curve after min/max decimation.(optional)
+    """
+    import tracker
+
+    times, ipd = tracker.decimate(track["times"], np.unwrap(track["ipd"],
+                                                            axis=0),
+                                  max_points)
+    _, ild = tracker.decimate(track["times"], track["ild"], max_points)
+
+    fig, (ax_ipd, ax_ild) = plt.subplots(2, 1, sharex=True)
+    ax_ipd.plot(times, np.rad2deg(ipd))
+    ax_ipd.set_ylabel("IPD [deg]")
+    ax_ild.plot(times, ild)
+    ax_ild.set_ylabel("ILD [dB]")
+    ax_ild.set_xlabel("Time [s]")
+    plt.show()